@@ -1,9 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWTError
 from bson import ObjectId  # ← ADD THIS IMPORT
 from app.config import settings
 from app.db.mongo import get_database
+from app.utils.jwt_handler import SECRET_KEY_BYTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -13,11 +15,11 @@ def decode_token(token: str):
     try:
         payload = jwt.decode(
             token,
-            settings.JWT_SECRET_KEY,
+            SECRET_KEY_BYTES,
             algorithms=[settings.JWT_ALGORITHM]
         )
         return payload
-    except JWTError as e:
+    except PyJWTError as e:
         print(f"❌ JWT Error: {e}")  # DEBUG
         return None
 
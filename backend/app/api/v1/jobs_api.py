@@ -3,6 +3,8 @@ from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 from app.services.embedding_service import embedding_service
+from app.services.search_service import invalidate_search_results
+from app.services._job_domains import DOMAIN_TAGGED_FIELDS, job_domain_tags
 from app.models.job import JobCreate, JobUpdate, JobResponse, JobStatus
 from app.api.dependencies import get_current_user
 from app.db.mongo import get_database
@@ -63,6 +65,7 @@ async def create_job(
     job_dict["updated_at"] = datetime.utcnow()
     job_dict["applications_count"] = 0
     job_dict["views_count"] = 0
+    job_dict["domain_tags"] = job_domain_tags(job_dict)
     
     # Embedding fields (will be generated immediately)
     job_dict["job_embedding"] = None
@@ -94,7 +97,8 @@ async def create_job(
                         "embedding_model": "all-MiniLM-L6-v2"
                     }
                 }
-            )            
+            )
+            invalidate_search_results()
         else:
             logger.error(f"⚠️ Failed to generate embedding for job {job_id}")    
     except Exception as e:
@@ -159,7 +163,7 @@ async def list_jobs(
     
     # Get jobs
     jobs = list(
-        db.jobs.find(query)
+        db.jobs.find(query, {"job_embedding": 0})
         .sort("posted_at", -1)
         .skip(skip)
         .limit(limit)
@@ -197,7 +201,7 @@ async def get_my_jobs(
     total = db.jobs.count_documents(query)
     
     jobs = list(
-        db.jobs.find(query)
+        db.jobs.find(query, {"job_embedding": 0})
         .sort("posted_at", -1)
         .skip(skip)
         .limit(limit)
@@ -221,7 +225,7 @@ async def get_job(
 ):
     """Get job details by ID"""
     
-    job = db.jobs.find_one({"_id": ObjectId(job_id)})
+    job = db.jobs.find_one({"_id": ObjectId(job_id)}, {"job_embedding": 0})
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -263,12 +267,19 @@ async def update_job(
     update_data = {k: v for k, v in job_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
+    # Re-tag domains when the text they're derived from changes
+    if any(field in update_data for field in DOMAIN_TAGGED_FIELDS):
+        update_data["domain_tags"] = job_domain_tags({**job, **update_data})
+    
     # Update job
     db.jobs.update_one(
         {"_id": ObjectId(job_id)},
         {"$set": update_data}
     )
     
+    # Cached semantic results may show the old version
+    invalidate_search_results()
+    
     logger.info(f"Job updated: {job_id}")
     
     return {
@@ -306,6 +317,9 @@ async def delete_job(
         }
     )
     
+    # Closed jobs must drop out of cached semantic results
+    invalidate_search_results()
+    
     logger.info(f"Job deleted: {job_id}")
     
     return {
@@ -344,6 +358,8 @@ async def toggle_job_status(
         }
     )
     
+    invalidate_search_results()
+    
     return {
         "success": True,
         "message": f"Job {'activated' if new_status else 'deactivated'} successfully",
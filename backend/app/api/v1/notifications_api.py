@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from typing import List, Optional
 from app.models.user import UserInDB
 from app.api.dependencies import get_current_user
 from app.services.notification_service import notification_service
@@ -15,16 +15,18 @@ async def get_notifications(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     unread_only: bool = False,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (keyset paging)"),
     current_user: UserInDB = Depends(get_current_user)
 ):
-    """Get user notifications"""
+    """Get user notifications (total is only returned for the first page)"""
     
     try:
-        notifications, total = await notification_service.get_user_notifications(
+        notifications, total, next_cursor = await notification_service.get_user_notifications(
             user_id=current_user.id,
             skip=skip,
             limit=limit,
-            unread_only=unread_only
+            unread_only=unread_only,
+            cursor=cursor
         )
         
         unread_count = await notification_service.get_unread_count(current_user.id)
@@ -33,8 +35,11 @@ async def get_notifications(
             "success": True,
             "notifications": notifications,
             "total": total,
+            "next_cursor": next_cursor,
             "unread_count": unread_count
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting notifications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -38,7 +38,7 @@ async def get_recommended_jobs(
     if not student or not student.get("profile_data"):
         # No profile - return recent jobs
         jobs = list(
-            db.jobs.find({"is_active": True, "status": "active"})
+            db.jobs.find({"is_active": True, "status": "active"}, {"job_embedding": 0})
             .sort("posted_at", -1)
             .limit(limit)
         )
@@ -61,14 +61,14 @@ async def get_recommended_jobs(
             }
             
             jobs = list(
-                db.jobs.find(query)
+                db.jobs.find(query, {"job_embedding": 0})
                 .sort("posted_at", -1)
                 .limit(limit)
             )
         else:
             # No skills in profile - return recent jobs
             jobs = list(
-                db.jobs.find({"is_active": True, "status": "active"})
+                db.jobs.find({"is_active": True, "status": "active"}, {"job_embedding": 0})
                 .sort("posted_at", -1)
                 .limit(limit)
             )
@@ -170,7 +170,7 @@ async def get_my_applications(
         app["_id"] = str(app["_id"])
         
         # Get job details
-        job = db.jobs.find_one({"_id": ObjectId(app["job_id"])})
+        job = db.jobs.find_one({"_id": ObjectId(app["job_id"])}, {"job_embedding": 0})
         if job:
             job["_id"] = str(job["_id"])
             app["job"] = job  # ✅ FIXED: Changed from "job_details" to "job"
@@ -275,7 +275,7 @@ async def get_bookmarked_jobs(
     jobs = []
     for bookmark in bookmarks:
         # Get job details
-        job = db.jobs.find_one({"_id": ObjectId(bookmark["job_id"])})
+        job = db.jobs.find_one({"_id": ObjectId(bookmark["job_id"])}, {"job_embedding": 0})
         if job:
             job["_id"] = str(job["_id"])
             job["bookmarked_at"] = bookmark["bookmarked_at"]
@@ -391,6 +391,7 @@ async def get_personalized_jobs(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     min_score: int = Query(80, ge=0, le=100, description="Minimum match score (0-100)"),  # ✅ Changed from 60 to 80
+    cursor: Optional[str] = Query(None, description="pagination.next_cursor from the previous page"),
     current_user = Depends(get_current_user),
     db = Depends(get_db)
 ):
@@ -412,12 +413,16 @@ async def get_personalized_jobs(
             student_id=current_user.id,
             page=page,
             limit=limit,
-            min_score=min_score / 100.0  # Convert 80 to 0.80
+            min_score=min_score / 100.0,  # Convert 80 to 0.80
+            cursor=cursor
         )
         
         if "error" in result:
             error_msg = result["error"]
             
+            if error_msg.startswith("Invalid cursor"):
+                raise HTTPException(status_code=400, detail=error_msg)
+            
             if "profile embedding not found" in error_msg.lower():
                 return {
                     "success": False,
@@ -430,7 +435,8 @@ async def get_personalized_jobs(
                         "total_count": 0,
                         "total_pages": 0,
                         "has_next": False,
-                        "has_prev": False
+                        "has_prev": False,
+                        "next_cursor": None
                     }
                 }
             
@@ -5,11 +5,11 @@ Path: backend/app/api/v1/students.py
 
 from fastapi import APIRouter, HTTPException, Depends, status, Body
 from typing import Optional, Dict, Any
-from app.db.mongo import get_database
 from app.middleware.auth_middleware import get_current_user
 from app.services.student_service import student_service
 from app.models.students import (
     StudentProfileData,
+    STUDENT_PROFILE_EXAMPLE,
     StudentProfileComplete,
     StudentProfileUpdate,
     AddEducationRequest,
@@ -23,7 +23,6 @@ from app.models.students import (
     Skill,
     Certification
 )
-from bson import ObjectId
 from datetime import datetime
 import traceback
 
@@ -61,7 +60,7 @@ async def get_student_profile(current_user: dict = Depends(get_current_user)):
 
 @router.post("/profile/complete")
 async def complete_student_profile(
-    request: StudentProfileComplete,
+    request: StudentProfileComplete = Body(..., examples=[{"profile_data": STUDENT_PROFILE_EXAMPLE}]),
     current_user: dict = Depends(get_current_user)
 ):
     """Complete student profile and generate embedding"""
@@ -111,7 +110,7 @@ async def complete_student_profile(
 
 @router.put("/profile/update")
 async def update_student_profile(
-    request: StudentProfileUpdate,
+    request: StudentProfileUpdate = Body(..., examples=[{"profile_data": STUDENT_PROFILE_EXAMPLE}]),
     current_user: dict = Depends(get_current_user)
 ):
     """Update entire student profile and regenerate embedding"""
@@ -512,24 +511,12 @@ async def get_embedding_status(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Only students can access this")
     
     try:
-        db = get_database()
-        user = db.users.find_one(
-            {"_id": ObjectId(current_user["user_id"])},
-            {"profile_embedding": 1, "embedding_generated_at": 1, "embedding_model": 1}
-        )
+        embedding_status = await student_service.get_embedding_status(current_user["user_id"])
         
-        if not user:
+        if not embedding_status:
             raise HTTPException(status_code=404, detail="User not found")
         
-        has_embedding = user.get("profile_embedding") is not None
-        
-        return {
-            "has_embedding": has_embedding,
-            "embedding_generated_at": user.get("embedding_generated_at"),
-            "embedding_model": user.get("embedding_model"),
-            "embedding_dimension": len(user.get("profile_embedding", [])) if has_embedding else 0,
-            "can_get_recommendations": has_embedding
-        }
+        return embedding_status
     except HTTPException:
         raise
     except Exception as e:
@@ -13,6 +13,9 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str
     DATABASE_NAME: str
+    MONGODB_MAX_POOL_SIZE: int = 200        # per client; scrapes + vector searches hold connections long
+    MONGODB_MIN_POOL_SIZE: int = 10         # keep warm connections for dashboard bursts
+    MONGODB_MAX_IDLE_TIME_MS: int = 300000  # reap idle connections after 5 minutes
     
     # JWT
     SECRET_KEY: str
@@ -38,6 +41,7 @@ class Settings(BaseSettings):
     GROQ_API_KEYS: Optional[str] = None  # ✅ Made optional
     GROQ_API_KEY: Optional[str] = None   # Backward compatible fallback
     GROQ_MODEL: str = "meta-llama/llama-4-scout-17b-16e-instruct"
+    GROQ_REDIS_URL: Optional[str] = None  # Share key rotation + cooldowns across workers
     
     @property
     def groq_api_keys_list(self) -> List[str]:
@@ -70,6 +74,7 @@ class Settings(BaseSettings):
     EMBEDDING_MAX_RETRIES: int = 3
     EMBEDDING_USE_GPU: bool = False
     EMBEDDING_WORKERS: int = 4
+    EMBEDDING_STYLE: str = "v1"  # "v2" = no duplicated fields, max_seq_length 128
     # ===========================================
     
     class Config:
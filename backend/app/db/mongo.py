@@ -1,4 +1,6 @@
-from pymongo import MongoClient
+import asyncio
+import weakref
+from pymongo import AsyncMongoClient, MongoClient
 import certifi
 from app.config import settings
 
@@ -6,10 +8,34 @@ from app.config import settings
 client = None
 db = None
 
+# Async client for services whose I/O shouldn't block the event loop
+async_client = None
+async_db = None
+async_loop = None
+
+# AsyncMongoClient is bound to the event loop it first runs on; code running
+# on any other loop (scripts, asyncio.run in a worker thread) gets its own
+# client here, dropped with its loop
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMongoClient]" = weakref.WeakKeyDictionary()
+
+
+def _new_async_client() -> AsyncMongoClient:
+    """Async client with the app's connection settings (connects lazily)"""
+    return AsyncMongoClient(
+        settings.MONGODB_URL,
+        tlsCAFile=certifi.where(),
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=20000,
+        socketTimeoutMS=20000,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS
+    )
+
 
 def connect_to_mongo():
     """Connect to MongoDB"""
-    global client, db
+    global client, db, async_client, async_db, async_loop
     try:
         # Add SSL certificate for MongoDB Atlas - THIS FIXES THE SSL ERROR
         client = MongoClient(
@@ -17,7 +43,10 @@ def connect_to_mongo():
             tlsCAFile=certifi.where(),
             serverSelectionTimeoutMS=5000,
             connectTimeoutMS=20000,
-            socketTimeoutMS=20000
+            socketTimeoutMS=20000,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS
         )
         
         # Test connection
@@ -26,10 +55,49 @@ def connect_to_mongo():
         db = client[settings.DATABASE_NAME]
         print(f"✅ Connected to MongoDB: {settings.DATABASE_NAME}")
         
+        # Connects lazily on first awaited operation, on the app's loop
+        async_client = _new_async_client()
+        async_db = async_client[settings.DATABASE_NAME]
+        try:
+            async_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            async_loop = None
+        
         # Create indexes
         db.users.create_index("email", unique=True)
         db.users.create_index("google_id", unique=True, sparse=True)
         
+        # Profiles whose embedding was queued but not yet written, re-queued
+        # at startup; partial so it only holds the (few) pending users
+        db.users.create_index("embedding_pending", partialFilterExpression={"embedding_pending": True})
+        
+        # Notification hot paths: per-user listing/unread counts sorted by
+        # created_at, plus the per-type / per-priority stats breakdowns
+        db.notifications.create_index([("user_id", 1), ("is_read", 1), ("created_at", -1)])
+        db.notifications.create_index([("user_id", 1), ("type", 1)])
+        db.notifications.create_index([("user_id", 1), ("priority", 1)])
+        
+        # Active job listings sorted by posted_at, and the old-job cleanup's
+        # posted_at range (partial indexes can't express its is_bookmarked $ne)
+        db.jobs.create_index([("is_active", 1), ("status", 1), ("posted_at", -1)])
+        db.jobs.create_index("posted_at")
+        
+        # Domain listings (multikey on the precomputed branch domain tags);
+        # _id breaks posted_at ties for keyset pagination
+        db.jobs.create_index([("domain_tags", 1), ("posted_at", -1), ("_id", -1)])
+        
+        # Scraped-job dedupe happens at insert time against this index;
+        # partial so institution-posted jobs (no scraped_at) aren't constrained
+        try:
+            db.jobs.create_index(
+                [("title", 1), ("company", 1), ("location", 1)],
+                unique=True,
+                partialFilterExpression={"scraped_at": {"$exists": True}},
+                name="scraped_job_identity"
+            )
+        except Exception as e:
+            print(f"⚠️ Could not create unique scraped job index (existing duplicates?): {e}")
+        
     except Exception as e:
         print(f"❌ Error connecting to MongoDB: {e}")
         raise
@@ -43,6 +111,30 @@ def close_mongo_connection():
         print("✅ MongoDB connection closed")
 
 
+async def close_async_mongo_connection():
+    """Close the async MongoDB client"""
+    global async_client
+    if async_client:
+        await async_client.close()
+        print("✅ Async MongoDB connection closed")
+
+
 def get_database():
     """Get database instance"""
-    return db
\ No newline at end of file
+    return db
+
+
+def get_async_database():
+    """Get async (non-blocking) database instance for the running event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return async_db
+    
+    if async_client is None or loop is async_loop or async_loop is None:
+        return async_db
+    
+    loop_client = _loop_clients.get(loop)
+    if loop_client is None:
+        loop_client = _loop_clients[loop] = _new_async_client()
+    return loop_client[settings.DATABASE_NAME]
\ No newline at end of file
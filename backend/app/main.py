@@ -2,12 +2,12 @@ import os
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.db.mongo import connect_to_mongo, close_mongo_connection
+from app.db.mongo import connect_to_mongo, close_mongo_connection, close_async_mongo_connection
 from app.api.v1 import api_router
 from app.api.v1 import jobs_api, notifications_api
 # Add after existing router imports
@@ -44,6 +44,28 @@ async def lifespan(app: FastAPI):
     from app.services.job_scheduler import start_scheduler
     start_scheduler()
     
+    # Make sure the Atlas job vector index exists with scalar quantization
+    from app.services.recommendation_service import recommendation_service
+    await recommendation_service.ensure_vector_index()
+    
+    # One-time: pack any surviving list-of-doubles job embeddings as float32
+    await recommendation_service.migrate_legacy_job_embeddings()
+    
+    # ...and student profile embeddings
+    from app.services.student_service import student_service
+    await student_service.migrate_legacy_profile_embeddings()
+    
+    # Profiles saved before the last shutdown whose embedding never got written
+    await student_service.resume_pending_embeddings()
+    
+    # ...and drop raw JobSpy rows left on jobs scraped before they were discarded
+    from app.services.scraper_service import job_scraper_service
+    await job_scraper_service.strip_legacy_raw_data()
+    
+    # ...and the full-text index hybrid search fuses with it
+    from app.services.search_service import search_service
+    await search_service.ensure_text_index()
+    
     yield
     
     print("🛑 Shutting down...")
@@ -52,7 +74,16 @@ async def lifespan(app: FastAPI):
     from app.services.job_scheduler import stop_scheduler
     stop_scheduler()
     
+    # Close the shared Groq HTTP client
+    from app.services.groq_service import close_groq_service
+    await close_groq_service()
+    
+    # Let the in-flight profile embedding write finish before Mongo closes
+    from app.services.student_service import student_service
+    await student_service.shutdown()
+    
     # Close MongoDB
+    await close_async_mongo_connection()
     close_mongo_connection()
 
 
@@ -60,7 +91,8 @@ app = FastAPI(
     title=settings.APP_NAME,
     description="Ascend - Time2Progress V-1.0",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 
@@ -287,4 +319,9 @@ async def admin_analytics_page(request: Request):
 # Health Check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    return {"status": "healthy", "database": "connected"}
+
+if __name__ == "__main__":
+    import uvicorn
+    # uvloop event loop + httptools parser for the Groq/Mongo I/O heavy workload
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 from enum import Enum
 
@@ -38,7 +38,7 @@ class JobInDB(JobBase):
     institution_id: str  # Reference to the institution that posted the job
     
     # ============ EMBEDDING FIELDS ============
-    job_embedding: Optional[List[float]] = None  # 384-dim vector
+    job_embedding: Optional[Union[bytes, List[float]]] = None  # 384-dim float32 BSON vector (legacy docs: list)
     embedding_generated_at: Optional[datetime] = None
     embedding_model: Optional[str] = "all-MiniLM-L6-v2"
     # ==========================================
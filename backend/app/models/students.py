@@ -250,34 +250,34 @@ class StudentProfileData(BaseModel):
     # ========== ADDITIONAL ==========
     summary: Optional[str] = Field(None, max_length=2000)
     achievements: Optional[str] = Field(None, max_length=2000)
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "full_name": "John Doe",
-                "phone": "+919876543210",
-                "location": "Bangalore, Karnataka",
-                "gender": "Male",
-                "education": [
-                    {
-                        "level": "UG",
-                        "board_university": "APJ Abdul Kalam University",
-                        "school_college": "IIT Delhi",
-                        "year": 2025,
-                        "percentage_cgpa": 8.5,
-                        "degree": "B.Tech",
-                        "branch": "Computer Science"
-                    }
-                ],
-                "skills": [
-                    {"name": "Python", "proficiency": "Expert", "category": "Programming"},
-                    {"name": "React", "proficiency": "Intermediate", "category": "Framework"}
-                ],
-                "domain_expertise": "Full Stack Development",
-                "total_experience_years": 0,
-                "current_role": "Student"
-            }
+
+
+# Request example for the profile endpoints. Kept out of the model Config so it
+# only costs anything when the OpenAPI schema is generated.
+STUDENT_PROFILE_EXAMPLE = {
+    "full_name": "John Doe",
+    "phone": "+919876543210",
+    "location": "Bangalore, Karnataka",
+    "gender": "Male",
+    "education": [
+        {
+            "level": "UG",
+            "board_university": "APJ Abdul Kalam University",
+            "school_college": "IIT Delhi",
+            "year": 2025,
+            "percentage_cgpa": 8.5,
+            "degree": "B.Tech",
+            "branch": "Computer Science"
         }
+    ],
+    "skills": [
+        {"name": "Python", "proficiency": "Expert", "category": "Programming"},
+        {"name": "React", "proficiency": "Intermediate", "category": "Framework"}
+    ],
+    "domain_expertise": "Full Stack Development",
+    "total_experience_years": 0,
+    "current_role": "Student"
+}
 
 
 # ============================================
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 from enum import Enum
 
@@ -26,7 +26,7 @@ class UserInDB(UserBase):
     profile_data: Optional[Dict[str, Any]] = None
     
     # ============ NEW EMBEDDING FIELDS ============
-    profile_embedding: Optional[List[float]] = None  # 384-dim vector for sentence-transformers
+    profile_embedding: Optional[Union[bytes, List[float]]] = None  # 384-dim float32 BSON vector (legacy docs: list)
     embedding_generated_at: Optional[datetime] = None
     embedding_model: Optional[str] = "all-MiniLM-L6-v2"  # Track which model generated the embedding
     # ==============================================
@@ -36,21 +36,6 @@ class UserInDB(UserBase):
     
     class Config:
         populate_by_name = True
-        json_schema_extra = {
-            "example": {
-                "_id": "507f1f77bcf86cd799439011",
-                "email": "student@example.com",
-                "role": "student",
-                "full_name": "John Doe",
-                "google_id": "1234567890",
-                "profile_completed": False,
-                "is_active": True,
-                "is_verified": True,
-                "profile_embedding": None,
-                "embedding_generated_at": None,
-                "embedding_model": "all-MiniLM-L6-v2"
-            }
-        }
 
 
 class UserCreate(BaseModel):
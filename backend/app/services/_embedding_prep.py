@@ -0,0 +1,97 @@
+"""
+Path: backend/app/services/_embedding_prep.py
+
+Text preparation for profile/job embeddings.
+
+Kept free of app imports and fully annotated so it can be compiled with
+mypyc for the batch embedding path:
+
+    cd backend && mypyc app/services/_embedding_prep.py
+
+The resulting extension module shadows this file on import; without it the
+pure-Python version below is used unchanged.
+"""
+
+from typing import Any, Dict, Final, Tuple
+
+
+# ==================== RELEVANT FIELDS ONLY ====================
+# (profile key, label, min length) in output order. A field listed twice
+# under different labels is deliberately reinforced. Free-text fields with a
+# min length are only included when they carry something meaningful.
+PROFILE_TEXT_FIELDS: Final = (
+    ("branch", "Branch", 0),                            # VERY IMPORTANT
+    ("branch", "Domain", 0),                            # Reinforce domain
+    ("degree", "Degree", 0),
+    ("technical_skills", "Skills", 0),                  # MOST IMPORTANT!
+    ("technical_skills", "Technical expertise", 0),     # Reinforce
+    ("soft_skills", "Soft skills", 0),
+    ("languages", "Languages", 0),
+    ("experience", "Experience", 10),
+    ("projects", "Projects", 10),
+    ("certifications", "Certifications", 5),
+    ("preferred_roles", "Seeking roles", 0),            # IMPORTANT
+    ("preferred_industries", "Industries", 3),
+)
+
+# (job key, label, max chars) in output order; 0 means no truncation.
+# Long descriptions are cut so they don't drown out title and skills.
+JOB_TEXT_FIELDS: Final = (
+    ("title", "Job title", 0),                          # VERY IMPORTANT
+    ("title", "Role", 0),                               # Reinforce
+    ("description", "Description", 500),               # MOST IMPORTANT
+    ("requirements", "Requirements", 300),
+    ("skills_required", "Skills needed", 0),            # VERY IMPORTANT
+    ("skills_required", "Technologies", 0),             # Reinforce
+    ("job_type", "Type", 0),
+    ("experience_required", "Experience", 0),
+)
+
+
+# v2 templates: each field appears once under a combined label. Same
+# information as v1 at roughly half the tokens, so encode cost drops with it.
+PROFILE_TEXT_FIELDS_V2: Final = (
+    ("branch", "Branch and domain", 0),
+    ("degree", "Degree", 0),
+    ("technical_skills", "Technical skills", 0),
+    ("soft_skills", "Soft skills", 0),
+    ("languages", "Languages", 0),
+    ("experience", "Experience", 10),
+    ("projects", "Projects", 10),
+    ("certifications", "Certifications", 5),
+    ("preferred_roles", "Seeking roles", 0),
+    ("preferred_industries", "Industries", 3),
+)
+
+JOB_TEXT_FIELDS_V2: Final = (
+    ("title", "Job title and role", 0),
+    ("description", "Description", 500),
+    ("requirements", "Requirements", 300),
+    ("skills_required", "Skills and technologies needed", 0),
+    ("job_type", "Type", 0),
+    ("experience_required", "Experience", 0),
+)
+
+
+def prepare_profile_text(
+    profile_data: Dict[str, Any],
+    fields: Tuple[Tuple[str, str, int], ...] = PROFILE_TEXT_FIELDS
+) -> str:
+    """Join the matching-relevant profile fields into one embedding text"""
+    return " | ".join(
+        f"{label}: {value}"
+        for key, label, min_len in fields
+        if (value := profile_data.get(key)) and (not min_len or len(value) > min_len)
+    )
+
+
+def prepare_job_text(
+    job_data: Dict[str, Any],
+    fields: Tuple[Tuple[str, str, int], ...] = JOB_TEXT_FIELDS
+) -> str:
+    """Join the matching-relevant job fields into one embedding text"""
+    return " | ".join(
+        f"{label}: {value[:max_len] if max_len else value}"
+        for key, label, max_len in fields
+        if (value := job_data.get(key))
+    )
@@ -0,0 +1,57 @@
+"""
+Path: backend/app/services/_job_domains.py
+
+Branch/domain tagging for jobs.
+
+Every job gets a precomputed ``domain_tags`` array when it is written, so
+listing jobs for a student's branch is an indexed equality lookup instead
+of an unanchored regex scan over title/description/skills.
+"""
+
+import re
+from typing import Dict, List, Mapping, Optional
+
+
+# Domain (matched as a substring of the student's branch) -> keywords that
+# put a job in that domain
+DOMAIN_KEYWORDS: Dict[str, List[str]] = {
+    'computer': ['software', 'developer', 'programmer', 'coding', 'web', 'app', 'data', 'ai', 'ml', 'tech'],
+    'electronics': ['hardware', 'embedded', 'circuit', 'electronics', 'iot', 'robotics'],
+    'mechanical': ['manufacturing', 'design', 'cad', 'mechanical', 'automotive', 'production'],
+    'electrical': ['electrical', 'power', 'energy', 'automation', 'control'],
+    'civil': ['civil', 'construction', 'structure', 'building', 'infrastructure'],
+    'chemical': ['chemical', 'process', 'plant', 'pharma', 'refinery']
+}
+
+# Job fields searched for domain keywords
+DOMAIN_TAGGED_FIELDS = ("title", "description", "skills_required")
+
+# Keyword alternation per domain, as sent to Mongo for untagged jobs
+DOMAIN_REGEX_PATTERNS: Dict[str, str] = {
+    domain: "|".join(map(re.escape, keywords))
+    for domain, keywords in DOMAIN_KEYWORDS.items()
+}
+
+# Same case-insensitive substring semantics as the old per-request $regex
+_DOMAIN_PATTERNS = {
+    domain: re.compile(pattern)
+    for domain, pattern in DOMAIN_REGEX_PATTERNS.items()
+}
+
+
+def job_domain_tags(job: Mapping) -> List[str]:
+    """Domains whose keywords appear in the job's title, description or skills"""
+    text = " ".join(
+        value for value in (job.get(field) for field in DOMAIN_TAGGED_FIELDS)
+        if isinstance(value, str)
+    ).lower()
+    return [domain for domain, pattern in _DOMAIN_PATTERNS.items() if pattern.search(text)]
+
+
+def branch_domain(branch: str) -> Optional[str]:
+    """Domain for a student's branch (e.g. "Computer Science" -> "computer"), if any"""
+    branch_lower = branch.lower()
+    for domain in DOMAIN_KEYWORDS:
+        if domain in branch_lower:
+            return domain
+    return None
@@ -1,12 +1,10 @@
 from datetime import datetime
 from typing import Optional, Dict
 import httpx
-from authlib.integrations.starlette_client import OAuth
 from app.config import settings
 from app.db.mongo import get_database
-from app.models.user import UserCreate, UserRole
+from app.models.user import UserResponse, UserRole
 from app.utils.jwt_handler import create_access_token
-from bson import ObjectId
 
 
 class AuthService:
@@ -51,12 +49,11 @@ class AuthService:
         """
 
         # 🔥 FIX: Ensure role becomes string ("student" / "institution")
-        if isinstance(role, UserRole):
-            role_value = role.value
-        else:
-            role_value = str(role)
+        # UserRole(...) accepts both the enum member and its raw value
+        role_value = UserRole(role).value
 
         db = get_database()
+        now = datetime.utcnow()
 
         # Check if user exists
         existing_user = db.users.find_one({"email": google_user["email"]})
@@ -65,7 +62,7 @@ class AuthService:
             # Update last login
             db.users.update_one(
                 {"_id": existing_user["_id"]},
-                {"$set": {"updated_at": datetime.utcnow()}}
+                {"$set": {"updated_at": now}}
             )
             existing_user["id"] = str(existing_user["_id"])
             return existing_user
@@ -81,8 +78,8 @@ class AuthService:
             "is_verified": True,  # Google users are pre-verified
             "profile_completed": False,
             "profile_data": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         }
 
         result = db.users.insert_one(new_user)
@@ -102,15 +99,17 @@ class AuthService:
 
         access_token = create_access_token(token_data)
 
-        user_response = {
-            "id": str(user["_id"]),
-            "email": user["email"],
-            "role": user["role"],
-            "full_name": user.get("full_name"),
-            "profile_picture": user.get("profile_picture"),
-            "profile_completed": user.get("profile_completed", False),
-            "is_verified": user.get("is_verified", False)
-        }
+        # Fields come straight from our own users document, so skip validation.
+        # exclude_unset keeps the payload to exactly the fields passed here.
+        user_response = UserResponse.model_construct(
+            id=str(user["_id"]),
+            email=user["email"],
+            role=UserRole(user["role"]),
+            full_name=user.get("full_name"),
+            profile_picture=user.get("profile_picture"),
+            profile_completed=user.get("profile_completed", False),
+            is_verified=user.get("is_verified", False)
+        ).model_dump(mode="json", exclude_unset=True)
 
         return {
             "access_token": access_token,
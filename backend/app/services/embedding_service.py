@@ -13,11 +13,46 @@ Date: December 2024
 
 import asyncio
 import logging
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 from datetime import datetime
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
+from app.config import settings
+from app.services._embedding_prep import (
+    JOB_TEXT_FIELDS,
+    JOB_TEXT_FIELDS_V2,
+    PROFILE_TEXT_FIELDS,
+    PROFILE_TEXT_FIELDS_V2,
+    prepare_job_text,
+    prepare_profile_text,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Header the driver writes ahead of a float32 vector's elements (dtype and
+# padding), taken from its own encoding of an empty vector
+_FLOAT32_VECTOR_HEADER = bytes(Binary.from_vector([], BinaryVectorDtype.FLOAT32))
+
+# For sizing stored vectors server-side without fetching them
+FLOAT32_VECTOR_HEADER_SIZE = len(_FLOAT32_VECTOR_HEADER)
+
+
+def to_bson_vector(vector: Any) -> Binary:
+    """
+    Pack an embedding as a BSON float32 vector (BinData subtype 9)
+    
+    4 bytes per dimension instead of ~9 for an array of doubles, and Atlas
+    Vector Search indexes/queries this format directly. Packed straight
+    from the float32 buffer: Binary.from_vector (pymongo 4.15) only takes
+    lists and would box every element on the way.
+    """
+    import numpy as np
+    
+    data = np.asarray(vector, dtype="<f4").tobytes()
+    return Binary(_FLOAT32_VECTOR_HEADER + data, subtype=VECTOR_SUBTYPE)
+
 
 class EmbeddingService:
     """
@@ -32,6 +67,17 @@ class EmbeddingService:
         self.model = None
         self.model_name = 'all-MiniLM-L6-v2'
         self.embedding_dim = 384
+        
+        # v2 drops the duplicated "reinforce" fields and caps sequence length
+        self.text_style = settings.EMBEDDING_STYLE
+        if self.text_style == "v2":
+            self.profile_fields = PROFILE_TEXT_FIELDS_V2
+            self.job_fields = JOB_TEXT_FIELDS_V2
+            self.max_seq_length = 128
+        else:
+            self.profile_fields = PROFILE_TEXT_FIELDS
+            self.job_fields = JOB_TEXT_FIELDS
+            self.max_seq_length = None
     
     def _load_model(self):
         """
@@ -43,6 +89,8 @@ class EmbeddingService:
             try:
                 from sentence_transformers import SentenceTransformer
                 self.model = SentenceTransformer(self.model_name)
+                if self.max_seq_length:
+                    self.model.max_seq_length = self.max_seq_length
                 self.embedding_dim = self.model.get_sentence_embedding_dimension()
                 logger.info(f"✅ Model loaded successfully! Dimension: {self.embedding_dim}")
             except Exception as e:
@@ -50,6 +98,16 @@ class EmbeddingService:
                 raise
         return self.model
     
+    def _encode_sync(self, text: str) -> Binary:
+        """
+        Encode text into an L2-normalized float32 BSON vector (blocking)
+        
+        Normalizing once here means cosine similarity downstream is a plain
+        dot product. Call through run_in_executor from async code.
+        """
+        vector = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+        return to_bson_vector(vector)
+    
     def _prepare_profile_text(self, profile_data: Dict) -> str:
         """
         Convert profile to text - ONLY RELEVANT FIELDS FOR MATCHING
@@ -59,63 +117,7 @@ class EmbeddingService:
         
         Why? Embeddings should capture MATCHING CRITERIA, not metadata!
         """
-        text_parts = []
-        
-        # ==================== RELEVANT FIELDS ONLY ====================
-        
-        # 1. Branch/Domain (VERY IMPORTANT)
-        if profile_data.get('branch'):
-            branch = profile_data['branch']
-            text_parts.append(f"Branch: {branch}")
-            text_parts.append(f"Domain: {branch}")  # Reinforce domain
-        
-        # 2. Degree (if relevant)
-        if profile_data.get('degree'):
-            text_parts.append(f"Degree: {profile_data['degree']}")
-        
-        # 3. Technical Skills (MOST IMPORTANT!)
-        if profile_data.get('technical_skills'):
-            skills = profile_data['technical_skills']
-            text_parts.append(f"Skills: {skills}")
-            text_parts.append(f"Technical expertise: {skills}")  # Reinforce
-        
-        # 4. Soft Skills
-        if profile_data.get('soft_skills'):
-            text_parts.append(f"Soft skills: {profile_data['soft_skills']}")
-        
-        # 5. Languages (keep this - can be relevant)
-        if profile_data.get('languages'):
-            text_parts.append(f"Languages: {profile_data['languages']}")
-        
-        # 6. Experience (IMPORTANT)
-        if profile_data.get('experience'):
-            exp = profile_data['experience']
-            if len(exp) > 10:  # Only if meaningful
-                text_parts.append(f"Experience: {exp}")
-        
-        # 7. Projects (IMPORTANT)
-        if profile_data.get('projects'):
-            projects = profile_data['projects']
-            if len(projects) > 10:  # Only if meaningful
-                text_parts.append(f"Projects: {projects}")
-        
-        # 8. Certifications
-        if profile_data.get('certifications'):
-            certs = profile_data['certifications']
-            if len(certs) > 5:  # Only if meaningful
-                text_parts.append(f"Certifications: {certs}")
-        
-        # 9. Preferred Roles (IMPORTANT)
-        if profile_data.get('preferred_roles'):
-            text_parts.append(f"Seeking roles: {profile_data['preferred_roles']}")
-        
-        # 10. Preferred Industries (can be relevant)
-        if profile_data.get('preferred_industries'):
-            industries = profile_data['preferred_industries']
-            if len(industries) > 3:
-                text_parts.append(f"Industries: {industries}")
-        
-        profile_text = " | ".join(filter(None, text_parts))
+        profile_text = prepare_profile_text(profile_data, self.profile_fields)
         
         logger.debug(f"Profile text (focused): {len(profile_text)} chars")
         
@@ -130,50 +132,13 @@ class EmbeddingService:
         
         Why? Focus on JOB REQUIREMENTS, not metadata!
         """
-        text_parts = []
-        
-        # ==================== RELEVANT FIELDS ONLY ====================
-        
-        # 1. Job Title (VERY IMPORTANT)
-        if job_data.get('title'):
-            title = job_data['title']
-            text_parts.append(f"Job title: {title}")
-            text_parts.append(f"Role: {title}")  # Reinforce
-        
-        # 2. Job Description (MOST IMPORTANT)
-        if job_data.get('description'):
-            desc = job_data['description']
-            # Take first 500 chars (full description might be too long)
-            desc = desc[:500] if len(desc) > 500 else desc
-            text_parts.append(f"Description: {desc}")
-        
-        # 3. Requirements (IMPORTANT)
-        if job_data.get('requirements'):
-            req = job_data['requirements']
-            req = req[:300] if len(req) > 300 else req
-            text_parts.append(f"Requirements: {req}")
-        
-        # 4. Skills Required (VERY IMPORTANT)
-        if job_data.get('skills_required'):
-            skills = job_data['skills_required']
-            text_parts.append(f"Skills needed: {skills}")
-            text_parts.append(f"Technologies: {skills}")  # Reinforce
-        
-        # 5. Job Type (helpful context)
-        if job_data.get('job_type'):
-            text_parts.append(f"Type: {job_data['job_type']}")
-        
-        # 6. Experience Required
-        if job_data.get('experience_required'):
-            text_parts.append(f"Experience: {job_data['experience_required']}")
-        
-        job_text = " | ".join(filter(None, text_parts))
+        job_text = prepare_job_text(job_data, self.job_fields)
         
         logger.debug(f"Job text (focused): {len(job_text)} chars")
         
         return job_text
     
-    async def generate_profile_embedding(self, profile_data: Dict) -> List[float]:
+    async def generate_profile_embedding(self, profile_data: Dict) -> Binary:
         """
         Generate focused embedding for student profile
         
@@ -181,7 +146,7 @@ class EmbeddingService:
             profile_data: Dictionary containing profile information
             
         Returns:
-            List of 384 floats (embedding vector)
+            Normalized 384-dim float32 vector packed as BSON Binary
             
         Raises:
             ValueError: If profile_data is empty or invalid
@@ -191,7 +156,7 @@ class EmbeddingService:
         
         try:
             # Lazy load model
-            model = self._load_model()
+            self._load_model()
             
             profile_text = self._prepare_profile_text(profile_data)
             
@@ -201,22 +166,17 @@ class EmbeddingService:
             
             # Run in executor to avoid blocking
             loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                lambda: model.encode(profile_text, convert_to_numpy=True)
-            )
-            
-            embedding_list = embedding.tolist()
+            embedding = await loop.run_in_executor(None, self._encode_sync, profile_text)
             
-            logger.info(f"✅ Generated focused profile embedding: {len(embedding_list)} dims")
+            logger.info(f"✅ Generated focused profile embedding: {self.embedding_dim} dims")
             
-            return embedding_list
+            return embedding
         
         except Exception as e:
             logger.error(f"Error generating profile embedding: {str(e)}")
             raise Exception(f"Profile embedding generation failed: {str(e)}")
     
-    async def generate_job_embedding(self, job_data: Dict = None, title: str = None, description: str = None, skills: str = None, requirements: str = None) -> List[float]:
+    async def generate_job_embedding(self, job_data: Dict = None, title: str = None, description: str = None, skills: str = None, requirements: str = None) -> Binary:
         """
         Generate focused embedding for job posting
         
@@ -228,7 +188,7 @@ class EmbeddingService:
             requirements: Job requirements (if using individual params)
             
         Returns:
-            List of 384 floats (embedding vector)
+            Normalized 384-dim float32 vector packed as BSON Binary
         """
         # ✅ ADDED: Support both dict and individual parameters
         if job_data is None:
@@ -248,7 +208,7 @@ class EmbeddingService:
         
         try:
             # Lazy load model
-            model = self._load_model()
+            self._load_model()
             
             job_text = self._prepare_job_text(job_data)
             
@@ -258,22 +218,17 @@ class EmbeddingService:
             
             # Run in executor to avoid blocking
             loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                lambda: model.encode(job_text, convert_to_numpy=True)
-            )
+            embedding = await loop.run_in_executor(None, self._encode_sync, job_text)
             
-            embedding_list = embedding.tolist()
+            logger.info(f"✅ Generated focused job embedding: {self.embedding_dim} dims")
             
-            logger.info(f"✅ Generated focused job embedding: {len(embedding_list)} dims")
-            
-            return embedding_list
+            return embedding
         
         except Exception as e:
             logger.error(f"Error generating job embedding: {str(e)}")
             raise Exception(f"Job embedding generation failed: {str(e)}")
     
-    async def generate_text_embedding(self, text: str) -> List[float]:
+    async def generate_text_embedding(self, text: str) -> Binary:
         """
         Generate embedding for search query text
         
@@ -281,11 +236,11 @@ class EmbeddingService:
             text: Any text string (e.g., search query)
             
         Returns:
-            List of 384 floats (embedding vector)
+            Normalized 384-dim float32 vector packed as BSON Binary
         """
         try:
             # Lazy load model
-            model = self._load_model()
+            self._load_model()
             
             if not text or not text.strip():
                 logger.warning("Empty text - using default")
@@ -293,33 +248,116 @@ class EmbeddingService:
             
             # Run in executor to avoid blocking
             loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
+            embedding = await loop.run_in_executor(None, self._encode_sync, text)
+            
+            logger.debug(f"Generated text embedding: {self.embedding_dim} dims")
+            
+            return embedding
+        
+        except Exception as e:
+            logger.error(f"Error generating text embedding: {str(e)}")
+            raise
+    
+    async def generate_job_embeddings_batch(self, jobs: List[Dict]) -> List[Binary]:
+        """
+        Generate focused embeddings for many job postings in one encode call
+        
+        Args:
+            jobs: List of job data dictionaries
+        
+        Returns:
+            One normalized float32 BSON vector per job, in input order
+        """
+        if not jobs:
+            return []
+        
+        try:
+            # Lazy load model
+            model = self._load_model()
+            
+            # Empty texts keep their slot so output lines up with input
+            job_texts = [self._prepare_job_text(job).strip() or "No job information" for job in jobs]
+            
+            loop = asyncio.get_event_loop()
+            embeddings = await loop.run_in_executor(
                 None,
-                lambda: model.encode(text, convert_to_numpy=True)
+                lambda: model.encode(
+                    job_texts,
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
             )
             
-            embedding_list = embedding.tolist()
+            logger.info(f"✅ Generated {len(job_texts)} job embeddings in batch")
             
-            logger.debug(f"Generated text embedding: {len(embedding_list)} dims")
+            return [to_bson_vector(vector) for vector in embeddings]
+        
+        except Exception as e:
+            logger.error(f"Batch job embedding generation failed: {str(e)}")
+            raise Exception(f"Batch job embedding generation failed: {str(e)}")
+    
+    async def generate_profile_embeddings_batch(self, profiles: List[Dict]) -> List[Binary]:
+        """
+        Generate focused embeddings for many student profiles in one encode call
+        
+        Args:
+            profiles: List of profile data dictionaries
+        
+        Returns:
+            One normalized float32 BSON vector per profile, in input order
+        """
+        if not profiles:
+            return []
+        
+        try:
+            # Lazy load model
+            model = self._load_model()
+            
+            # Empty texts keep their slot so output lines up with input
+            profile_texts = [
+                self._prepare_profile_text(profile).strip() or "No profile information"
+                for profile in profiles
+            ]
+            
+            loop = asyncio.get_event_loop()
+            embeddings = await loop.run_in_executor(
+                None,
+                lambda: model.encode(
+                    profile_texts,
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            )
             
-            return embedding_list
+            logger.info(f"✅ Generated {len(profile_texts)} profile embeddings in batch")
+            
+            return [to_bson_vector(vector) for vector in embeddings]
         
         except Exception as e:
-            logger.error(f"Error generating text embedding: {str(e)}")
-            raise
+            logger.error(f"Batch profile embedding generation failed: {str(e)}")
+            raise Exception(f"Batch profile embedding generation failed: {str(e)}")
     
-    async def batch_generate_embeddings(self, profiles: List[Dict]) -> List[List[float]]:
+    async def batch_generate_embeddings(self, profiles: List[Dict]) -> "np.ndarray":
         """
         Generate embeddings for multiple profiles at once (more efficient)
         
+        Vectors come back L2-normalized, so cosine similarity against them is
+        a plain dot product (e.g. ``embeddings @ query_vec``).
+        
         Args:
             profiles: List of profile data dictionaries
             
         Returns:
-            List of embedding vectors
+            float32 matrix of shape (N, embedding_dim)
         """
+        import numpy as np
+        
         if not profiles:
-            return []
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
         
         try:
             # Lazy load model
@@ -335,18 +373,22 @@ class EmbeddingService:
                 raise ValueError("No valid profile texts to encode")
             
             # Generate embeddings in batch (more efficient)
+            # Normalization happens inside encode, so no per-row post-processing
             loop = asyncio.get_event_loop()
             embeddings = await loop.run_in_executor(
                 None,
-                lambda: model.encode(valid_texts, convert_to_numpy=True)
+                lambda: model.encode(
+                    valid_texts,
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
             )
             
-            # Convert to list of lists
-            embeddings_list = [emb.tolist() for emb in embeddings]
-            
-            logger.info(f"Successfully generated {len(embeddings_list)} embeddings in batch")
+            logger.info(f"Successfully generated {len(embeddings)} embeddings in batch")
             
-            return embeddings_list
+            return embeddings.astype(np.float32, copy=False)
         
         except Exception as e:
             logger.error(f"Batch embedding generation failed: {str(e)}")
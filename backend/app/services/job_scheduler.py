@@ -7,9 +7,12 @@ SMART Job Scheduler - Dynamically scrapes based on student profiles
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
+import asyncio
 import logging
+import re
+import time
 import pytz
-from typing import List, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 from app.services.scraper_service import job_scraper_service
 from app.db.mongo import get_database
 
@@ -19,76 +22,151 @@ logger = logging.getLogger(__name__)
 IST = pytz.timezone('Asia/Kolkata')
 scheduler = AsyncIOScheduler(timezone=IST)
 
+# Skills that are turned into "<skill> developer/intern" search terms
+SKILL_KEYWORDS = frozenset({
+    "python", "java", "javascript", "react", "angular", "node.js", "nodejs",
+    "machine learning", "data science", "web development", "frontend", "backend",
+    "full stack", "devops", "cloud", "aws", "azure", "android", "ios",
+    "flutter", "react native", "ui/ux", "graphic design", "digital marketing",
+    "content writing", "seo", "data analyst", "business analyst",
+    "mechanical", "cad", "autocad", "solidworks", "civil", "electrical",
+    "embedded", "iot", "robotics", "automation"
+})
+
+# Branch substring -> job titles to search for
+BRANCH_MAPPING = {
+    "computer science": ["software engineer", "web developer", "data analyst"],
+    "information technology": ["software engineer", "web developer", "it support"],
+    "mechanical": ["mechanical engineer", "cad designer", "manufacturing engineer"],
+    "electrical": ["electrical engineer", "embedded engineer", "electronics"],
+    "civil": ["civil engineer", "structural engineer", "site engineer"],
+    "electronics": ["electronics engineer", "embedded developer", "iot engineer"]
+}
+
+# Interests containing any of these are used as search terms directly
+INTEREST_KEYWORDS = ("development", "design", "engineering", "analysis")
+_INTEREST_RE = re.compile("|".join(INTEREST_KEYWORDS))
+
+# Dynamic search terms are reused for this long before users is re-scanned
+SEARCH_TERMS_TTL_SECONDS = 30 * 60
+_search_terms_cache: Optional[Tuple[float, List[str]]] = None
+
+
+def _csv_terms(field: str) -> Dict[str, Any]:
+    """Aggregation expression: lower-cased, trimmed, non-empty parts of a comma-separated profile_data field."""
+    path = f"$profile_data.{field}"
+    return {"$filter": {
+        "input": {"$map": {
+            "input": {"$cond": [
+                {"$eq": [{"$type": path}, "string"]},
+                {"$split": [{"$toLower": path}, ","]},
+                []
+            ]},
+            "in": {"$trim": {"input": "$$this"}}
+        }},
+        "cond": {"$ne": ["$$this", ""]}
+    }}
+
+
+def _union_all(arrays_field: str) -> Dict[str, Any]:
+    """Aggregation expression: set-union of an array of arrays."""
+    return {"$reduce": {
+        "input": arrays_field,
+        "initialValue": [],
+        "in": {"$setUnion": ["$$value", "$$this"]}
+    }}
+
 
 def extract_dynamic_search_terms() -> List[str]:
     """
     Extract search terms dynamically from student profiles
     
+    Results are cached for SEARCH_TERMS_TTL_SECONDS; profile saves call
+    invalidate_search_terms() to force a fresh scan.
+    
     Returns:
         List of unique search terms based on student skills, interests, and roles
     """
+    global _search_terms_cache
+    
+    now = time.monotonic()
+    if _search_terms_cache is not None and now < _search_terms_cache[0]:
+        logger.info("♻️ Using cached dynamic search terms")
+        return list(_search_terms_cache[1])
+    
+    terms = _build_dynamic_search_terms()
+    if terms is None:
+        # Fallbacks aren't cached so the next call retries the real scan
+        return get_default_search_terms()
+    
+    _search_terms_cache = (now + SEARCH_TERMS_TTL_SECONDS, terms)
+    return list(terms)
+
+
+def invalidate_search_terms():
+    """Drop cached search terms (call after student profile updates)."""
+    global _search_terms_cache
+    _search_terms_cache = None
+
+
+def _build_dynamic_search_terms() -> Optional[List[str]]:
+    """Scan student profiles for search terms; None means use the defaults."""
     try:
         db = get_database()
         
-        logger.info("=" * 70)
-        logger.info("🔍 EXTRACTING DYNAMIC SEARCH TERMS FROM STUDENT PROFILES")
-        logger.info("=" * 70)
-        
-        # Get all students with completed profiles
-        students = list(db.users.find({
-            "role": "student",
-            "profile_completed": True,
-            "profile_data": {"$exists": True}
-        }))
-        
-        logger.info(f"📊 Found {len(students)} students with completed profiles")
+        # Split/trim/dedupe every student's profile fields server-side and
+        # get back one document with the distinct values
+        pipeline = [
+            {"$match": {
+                "role": "student",
+                "profile_completed": True,
+                "profile_data": {"$exists": True}
+            }},
+            # Only the five profile fields used below leave the storage layer
+            {"$project": {
+                "_id": 0,
+                "profile_data.technical_skills": 1,
+                "profile_data.soft_skills": 1,
+                "profile_data.interests": 1,
+                "profile_data.preferred_roles": 1,
+                "profile_data.branch": 1
+            }},
+            {"$project": {
+                "skills": {"$concatArrays": [_csv_terms("technical_skills"), _csv_terms("soft_skills")]},
+                "interests": _csv_terms("interests"),
+                "roles": _csv_terms("preferred_roles"),
+                "branch": {"$trim": {"input": {"$toLower": {"$ifNull": ["$profile_data.branch", ""]}}}}
+            }},
+            {"$group": {
+                "_id": None,
+                "student_count": {"$sum": 1},
+                "skills": {"$addToSet": "$skills"},
+                "interests": {"$addToSet": "$interests"},
+                "roles": {"$addToSet": "$roles"},
+                "branches": {"$addToSet": "$branch"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "student_count": 1,
+                "skills": _union_all("$skills"),
+                "interests": _union_all("$interests"),
+                "roles": _union_all("$roles"),
+                "branches": {"$setDifference": ["$branches", [""]]}
+            }}
+        ]
+        # Single-document result read straight off the cursor; allowDiskUse
+        # keeps the $group safe at large student counts
+        result = next(db.users.aggregate(pipeline, allowDiskUse=True), None)
+        student_count = result["student_count"] if result else 0
         
-        if not students:
+        if not student_count:
             logger.warning("⚠️ No students found, using default terms")
-            return get_default_search_terms()
-        
-        # Collect all skills, interests, and preferred roles
-        all_skills: Set[str] = set()
-        all_interests: Set[str] = set()
-        all_roles: Set[str] = set()
-        all_branches: Set[str] = set()
-        
-        for student in students:
-            profile_data = student.get("profile_data", {})
-            
-            # Extract technical skills
-            tech_skills = profile_data.get("technical_skills", "")
-            if tech_skills:
-                skills_list = [s.strip().lower() for s in tech_skills.split(",")]
-                all_skills.update(skills_list)
-            
-            # Extract soft skills
-            soft_skills = profile_data.get("soft_skills", "")
-            if soft_skills:
-                skills_list = [s.strip().lower() for s in soft_skills.split(",")]
-                all_skills.update(skills_list)
-            
-            # Extract interests
-            interests = profile_data.get("interests", "")
-            if interests:
-                interests_list = [i.strip().lower() for i in interests.split(",")]
-                all_interests.update(interests_list)
-            
-            # Extract preferred roles
-            preferred_roles = profile_data.get("preferred_roles", "")
-            if preferred_roles:
-                roles_list = [r.strip().lower() for r in preferred_roles.split(",")]
-                all_roles.update(roles_list)
-            
-            # Extract branch
-            branch = profile_data.get("branch", "")
-            if branch:
-                all_branches.add(branch.strip().lower())
+            return None
         
-        logger.info(f"📌 Extracted {len(all_skills)} unique skills")
-        logger.info(f"📌 Extracted {len(all_interests)} unique interests")
-        logger.info(f"📌 Extracted {len(all_roles)} unique roles")
-        logger.info(f"📌 Extracted {len(all_branches)} unique branches")
+        all_skills: Set[str] = set(result["skills"])
+        all_interests: Set[str] = set(result["interests"])
+        all_roles: Set[str] = set(result["roles"])
+        all_branches: Set[str] = set(result["branches"])
         
         # Build search terms
         search_terms: Set[str] = set()
@@ -102,59 +180,47 @@ def extract_dynamic_search_terms() -> List[str]:
                     search_terms.add(f"{role} fresher")
                     search_terms.add(f"{role} intern")
         
-        # Add skills as search terms
-        skill_keywords = [
-            "python", "java", "javascript", "react", "angular", "node.js", "nodejs",
-            "machine learning", "data science", "web development", "frontend", "backend",
-            "full stack", "devops", "cloud", "aws", "azure", "android", "ios",
-            "flutter", "react native", "ui/ux", "graphic design", "digital marketing",
-            "content writing", "seo", "data analyst", "business analyst",
-            "mechanical", "cad", "autocad", "solidworks", "civil", "electrical",
-            "embedded", "iot", "robotics", "automation"
-        ]
+        # Values arrive trimmed + lower-cased from the aggregation
         
-        for skill in all_skills:
-            skill_clean = skill.strip().lower()
-            if skill_clean in skill_keywords and len(skill_clean) > 3:
-                search_terms.add(f"{skill_clean} developer")
-                search_terms.add(f"{skill_clean} intern")
+        # Add skills as search terms
+        search_terms.update(
+            f"{skill} {suffix}"
+            for skill in all_skills & SKILL_KEYWORDS if len(skill) > 3
+            for suffix in ("developer", "intern")
+        )
         
         # Add branch-based terms
-        branch_mapping = {
-            "computer science": ["software engineer", "web developer", "data analyst"],
-            "information technology": ["software engineer", "web developer", "it support"],
-            "mechanical": ["mechanical engineer", "cad designer", "manufacturing engineer"],
-            "electrical": ["electrical engineer", "embedded engineer", "electronics"],
-            "civil": ["civil engineer", "structural engineer", "site engineer"],
-            "electronics": ["electronics engineer", "embedded developer", "iot engineer"]
-        }
-        
-        for branch in all_branches:
-            branch_lower = branch.lower()
-            for key, terms in branch_mapping.items():
-                if key in branch_lower:
-                    for term in terms:
-                        search_terms.add(term)
-                        search_terms.add(f"{term} fresher")
+        search_terms.update(
+            variant
+            for branch in all_branches
+            for key, terms in BRANCH_MAPPING.items() if key in branch
+            for term in terms
+            for variant in (term, f"{term} fresher")
+        )
         
         # Add interest-based terms
-        for interest in all_interests:
-            interest_clean = interest.strip().lower()
-            if len(interest_clean) > 5:  # Skip very short interests
-                if any(keyword in interest_clean for keyword in ["development", "design", "engineering", "analysis"]):
-                    search_terms.add(interest_clean)
+        search_terms.update(
+            interest
+            for interest in all_interests
+            if len(interest) > 5 and _INTEREST_RE.search(interest)  # Skip very short interests
+        )
         
         # Convert to list and limit to top 30 terms
         final_terms = list(search_terms)[:30]
         
-        logger.info(f"✅ Generated {len(final_terms)} dynamic search terms")
-        logger.info(f"Sample terms: {', '.join(final_terms[:5])}")
+        logger.info(
+            f"🔍 Generated {len(final_terms)} dynamic search terms from {student_count} students "
+            f"({len(all_skills)} skills, {len(all_interests)} interests, "
+            f"{len(all_roles)} roles, {len(all_branches)} branches)"
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sample terms: {', '.join(final_terms[:5])}")
         
-        return final_terms if final_terms else get_default_search_terms()
+        return final_terms or None
         
     except Exception as e:
         logger.error(f"❌ Error extracting search terms: {str(e)}")
-        return get_default_search_terms()
+        return None
 
 
 def get_default_search_terms() -> List[str]:
@@ -178,15 +244,13 @@ async def scheduled_job_scraping():
     Smart scheduled job scraping using dynamic search terms from student profiles
     """
     try:
-        logger.info("=" * 70)
-        logger.info("🤖 SMART SCHEDULED JOB SCRAPING STARTED")
-        logger.info(f"⏰ Time: {datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S IST')}")
-        logger.info("=" * 70)
+        logger.info(f"🤖 Smart scheduled job scraping started at {datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S IST')}")
         
-        # Get dynamic search terms from student profiles
-        search_terms = extract_dynamic_search_terms()
+        # Get dynamic search terms from student profiles (blocking pymongo
+        # scan - run it off the event loop the scheduler shares with the API)
+        search_terms = await asyncio.to_thread(extract_dynamic_search_terms)
         
-        logger.info(f"🎯 Scraping jobs for {len(search_terms)} terms based on student profiles")
+        logger.debug(f"🎯 Scraping jobs for {len(search_terms)} terms based on student profiles")
         
         # Scrape and store jobs
         stats = await job_scraper_service.scrape_and_store_jobs(
@@ -195,23 +259,19 @@ async def scheduled_job_scraping():
             results_per_term=15
         )
         
-        logger.info("=" * 70)
-        logger.info("📊 SMART SCRAPING SUMMARY")
-        logger.info("=" * 70)
-        logger.info(f"Search Terms Used: {len(search_terms)}")
-        logger.info(f"Total Scraped: {stats['total_scraped']}")
-        logger.info(f"✅ Successfully Saved: {stats['total_saved']}")
-        logger.info(f"🔄 Duplicates Skipped: {stats['total_duplicates']}")
-        logger.info(f"❌ Failed: {stats['total_failed']}")
-        logger.info("=" * 70)
-        
         # Cleanup old jobs
-        logger.info("🧹 Running cleanup...")
-        
         deleted = await job_scraper_service.cleanup_old_unbookmarked_jobs(days_old=7)
         
-        logger.info(f"🗑️ Deleted {deleted} old unbookmarked jobs")
-        logger.info("✅ Smart scheduled job scraping completed successfully!")
+        # One summary record per run
+        summary = {
+            "search_terms": len(search_terms),
+            "scraped": stats["total_scraped"],
+            "saved": stats["total_saved"],
+            "duplicates": stats["total_duplicates"],
+            "failed": stats["total_failed"],
+            "deleted_old": deleted
+        }
+        logger.info(f"✅ Smart scheduled job scraping completed: {summary}", extra={"scheduled_scrape": summary})
         
     except Exception as e:
         logger.error(f"❌ Scheduled job scraping failed: {str(e)}")
@@ -1,39 +1,65 @@
+import asyncio
+import base64
+import json
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, Set, Tuple
 from bson import ObjectId
-from app.db.mongo import get_database
+from pymongo.errors import BulkWriteError
+from app.db.mongo import get_async_database
 from app.models.notification import NotificationType, NotificationPriority
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Max emails in flight at once for bulk notifications
+EMAIL_SEND_CONCURRENCY = 32
+
+# Max ids per update_many when marking notifications read
+MARK_READ_CHUNK_SIZE = 1000
+
+# Strong refs to fire-and-forget email tasks so they aren't GC'd mid-send
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _encode_cursor(notification: Dict) -> str:
+    """Opaque keyset cursor pointing just past ``notification`` in (created_at desc, _id desc) order"""
+    payload = {"last_created_at": notification["created_at"].isoformat(), "last_id": str(notification["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of _encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["last_created_at"]), ObjectId(payload["last_id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
 
 class NotificationService:
     """Service for managing notifications"""
     
     def get_database(self):
-        db = get_database()
+        db = get_async_database()
         if db is None:
             raise Exception("Database not connected")
         return db
     
-    async def create_notification(
+    def _build_notification_doc(
         self,
-        user_id: str,
+        user_id: Optional[str],
         type: NotificationType,
         title: str,
         message: str,
-        priority: NotificationPriority = NotificationPriority.MEDIUM,
-        related_job_id: Optional[str] = None,
-        related_institution_id: Optional[str] = None,
-        action_url: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None,
-        send_email: bool = True
-    ) -> str:
-        """Create a new notification"""
-        db = self.get_database()
-        
-        notification = {
+        priority: NotificationPriority,
+        related_job_id: Optional[str],
+        related_institution_id: Optional[str],
+        action_url: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Canonical notification document"""
+        return {
             "user_id": user_id,
             "type": type.value if isinstance(type, NotificationType) else type,
             "title": title,
@@ -45,19 +71,45 @@ class NotificationService:
             "metadata": metadata or {},
             "is_read": False,
             "is_email_sent": False,
-            "created_at": datetime.utcnow(),
+            "created_at": now or datetime.utcnow(),
             "read_at": None
         }
+    
+    async def create_notification(
+        self,
+        user_id: str,
+        type: NotificationType,
+        title: str,
+        message: str,
+        priority: NotificationPriority = NotificationPriority.MEDIUM,
+        related_job_id: Optional[str] = None,
+        related_institution_id: Optional[str] = None,
+        action_url: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        send_email: bool = True
+    ) -> str:
+        """Create a new notification"""
+        db = self.get_database()
         
-        result = db.notifications.insert_one(notification)
+        notification = self._build_notification_doc(
+            user_id, type, title, message, priority,
+            related_job_id, related_institution_id, action_url, metadata
+        )
+        
+        result = await db.notifications.insert_one(notification)
         notification_id = str(result.inserted_id)
         
-        logger.info(f"Created notification {notification_id} for user {user_id}")
+        logger.debug(f"Created notification {notification_id} for user {user_id}")
         
-        # Send email notification if requested
+        # Send email notification if requested - in the background, the
+        # caller doesn't wait on SMTP (send_email_notification logs failures)
         if send_email:
             try:
-                await self.send_email_notification(notification_id, user_id, title, message, action_url)
+                task = asyncio.create_task(
+                    self.send_email_notification(notification_id, user_id, title, message, action_url)
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
             except Exception as e:
                 logger.error(f"Failed to send email notification: {e}")
         
@@ -65,7 +117,7 @@ class NotificationService:
     
     async def create_bulk_notifications(
         self,
-        user_ids: List[str],
+        user_ids: Iterable[str],
         type: NotificationType,
         title: str,
         message: str,
@@ -76,41 +128,40 @@ class NotificationService:
         metadata: Optional[Dict[str, Any]] = None,
         send_email: bool = True
     ) -> List[str]:
-        """Create notifications for multiple users"""
+        """Create notifications for multiple users (user_ids may be any iterable, e.g. a cursor)"""
         db = self.get_database()
         
-        notifications = []
-        for user_id in user_ids:
-            notification = {
-                "user_id": user_id,
-                "type": type.value if isinstance(type, NotificationType) else type,
-                "title": title,
-                "message": message,
-                "priority": priority.value if isinstance(priority, NotificationPriority) else priority,
-                "related_job_id": related_job_id,
-                "related_institution_id": related_institution_id,
-                "action_url": action_url,
-                "metadata": metadata or {},
-                "is_read": False,
-                "is_email_sent": False,
-                "created_at": datetime.utcnow(),
-                "read_at": None
-            }
-            notifications.append(notification)
+        # Every field but user_id is shared - build it once (one timestamp per batch)
+        template = self._build_notification_doc(
+            None, type, title, message, priority,
+            related_job_id, related_institution_id, action_url, metadata,
+            now=datetime.utcnow()
+        )
+        notifications = [{**template, "user_id": user_id} for user_id in user_ids]
         
         if notifications:
-            result = db.notifications.insert_many(notifications)
-            notification_ids = [str(id) for id in result.inserted_ids]
+            try:
+                result = await db.notifications.insert_many(notifications, ordered=False)
+                notification_ids = list(map(str, result.inserted_ids))
+            except BulkWriteError as bwe:
+                # Unordered: everything except the reported failures was written
+                write_errors = bwe.details.get("writeErrors", [])
+                logger.error(f"Bulk notification insert had {len(write_errors)} errors: {write_errors}")
+                failed = {err["index"] for err in write_errors}
+                notifications = [n for i, n in enumerate(notifications) if i not in failed]
+                notification_ids = [str(n["_id"]) for n in notifications]
             
             logger.info(f"Created {len(notification_ids)} bulk notifications")
             
             # Send email notifications
-            if send_email:
-                for user_id in user_ids:
-                    try:
-                        await self.send_email_notification(None, user_id, title, message, action_url)
-                    except Exception as e:
-                        logger.error(f"Failed to send email to {user_id}: {e}")
+            if send_email and notifications:
+                await self.send_bulk_email_notifications(
+                    [n["user_id"] for n in notifications],
+                    title,
+                    message,
+                    action_url,
+                    notification_ids=notification_ids
+                )
             
             return notification_ids
         
@@ -121,24 +172,47 @@ class NotificationService:
         user_id: str,
         skip: int = 0,
         limit: int = 50,
-        unread_only: bool = False
-    ) -> tuple[List[Dict], int]:
-        """Get notifications for a user"""
+        unread_only: bool = False,
+        cursor: Optional[str] = None
+    ) -> tuple[List[Dict], Optional[int], Optional[str]]:
+        """
+        Get notifications for a user, newest first.
+        
+        Pass the previous page's next_cursor as `cursor` to page via the
+        (user_id, is_read, created_at) index instead of skipping; _id breaks
+        ties between notifications created in the same bulk insert.
+        The total is only counted for the first page; later pages return None.
+        Raises ValueError on a malformed cursor.
+        """
         db = self.get_database()
         
+        keyset = _decode_cursor(cursor) if cursor else None
+        
         query = {"user_id": user_id}
         if unread_only:
             query["is_read"] = False
         
-        total = db.notifications.count_documents(query)
+        first_page = skip == 0 and keyset is None
+        total = await db.notifications.count_documents(query) if first_page else None
         
-        notifications = list(
-            db.notifications.find(query)
-            .sort("created_at", -1)
+        if keyset is not None:
+            last_created_at, last_id = keyset
+            query["$or"] = [
+                {"created_at": {"$lt": last_created_at}},
+                {"created_at": last_created_at, "_id": {"$lt": last_id}}
+            ]
+            skip = 0
+        
+        notifications = await (
+            db.notifications.find(query, {"metadata": 0})
+            .sort([("created_at", -1), ("_id", -1)])
             .skip(skip)
             .limit(limit)
+            .to_list()
         )
         
+        next_cursor = _encode_cursor(notifications[-1]) if len(notifications) == limit else None
+        
         # Convert ObjectId to string
         for notif in notifications:
             notif["_id"] = str(notif["_id"])
@@ -147,38 +221,45 @@ class NotificationService:
             if notif.get("related_institution_id"):
                 notif["related_institution_id"] = str(notif["related_institution_id"])
         
-        return notifications, total
+        return notifications, total, next_cursor
     
     async def get_unread_count(self, user_id: str) -> int:
         """Get count of unread notifications"""
         db = self.get_database()
-        return db.notifications.count_documents({"user_id": user_id, "is_read": False})
+        return await db.notifications.count_documents({"user_id": user_id, "is_read": False})
     
     async def mark_as_read(self, notification_ids: List[str], user_id: str) -> int:
         """Mark notifications as read"""
         db = self.get_database()
         
-        result = db.notifications.update_many(
-            {
-                "_id": {"$in": [ObjectId(id) for id in notification_ids]},
-                "user_id": user_id
-            },
-            {
-                "$set": {
-                    "is_read": True,
-                    "read_at": datetime.utcnow()
-                }
+        oids = list(map(ObjectId, notification_ids))
+        update = {
+            "$set": {
+                "is_read": True,
+                "read_at": datetime.utcnow()
             }
-        )
+        }
         
-        logger.info(f"Marked {result.modified_count} notifications as read for user {user_id}")
-        return result.modified_count
+        # Large selections go in blocks to keep each command small
+        modified = 0
+        for start in range(0, len(oids), MARK_READ_CHUNK_SIZE):
+            result = await db.notifications.update_many(
+                {
+                    "_id": {"$in": oids[start:start + MARK_READ_CHUNK_SIZE]},
+                    "user_id": user_id
+                },
+                update
+            )
+            modified += result.modified_count
+        
+        logger.debug(f"Marked {modified} notifications as read for user {user_id}")
+        return modified
     
     async def mark_all_as_read(self, user_id: str) -> int:
         """Mark all user's notifications as read"""
         db = self.get_database()
         
-        result = db.notifications.update_many(
+        result = await db.notifications.update_many(
             {"user_id": user_id, "is_read": False},
             {
                 "$set": {
@@ -188,14 +269,14 @@ class NotificationService:
             }
         )
         
-        logger.info(f"Marked all notifications as read for user {user_id}")
+        logger.debug(f"Marked all notifications as read for user {user_id}")
         return result.modified_count
     
     async def delete_notification(self, notification_id: str, user_id: str) -> bool:
         """Delete a notification"""
         db = self.get_database()
         
-        result = db.notifications.delete_one({
+        result = await db.notifications.delete_one({
             "_id": ObjectId(notification_id),
             "user_id": user_id
         })
@@ -206,20 +287,39 @@ class NotificationService:
         """Get notification statistics for a user"""
         db = self.get_database()
         
-        total = db.notifications.count_documents({"user_id": user_id})
-        unread = db.notifications.count_documents({"user_id": user_id, "is_read": False})
+        # One pass over the user's notifications instead of 11 count queries
+        cursor = await db.notifications.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "totals": [{"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "unread": {"$sum": {"$cond": [{"$eq": ["$is_read", False]}, 1, 0]}}
+                }}],
+                "by_type": [{"$group": {"_id": "$type", "count": {"$sum": 1}}}],
+                "by_priority": [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}]
+            }}
+        ])
+        docs = await cursor.to_list(length=1)
+        result = docs[0] if docs else {}
+        
+        totals = result.get("totals") or [{}]
+        total = totals[0].get("total", 0)
+        unread = totals[0].get("unread", 0)
         
         # Count by type
-        by_type = {}
-        for type_value in ["job_posted", "job_updated", "job_deadline", "system", "announcement"]:
-            count = db.notifications.count_documents({"user_id": user_id, "type": type_value})
-            by_type[type_value] = count
+        type_counts = {row["_id"]: row["count"] for row in result.get("by_type", [])}
+        by_type = {
+            type_value: type_counts.get(type_value, 0)
+            for type_value in ["job_posted", "job_updated", "job_deadline", "system", "announcement"]
+        }
         
         # Count by priority
-        by_priority = {}
-        for priority in ["low", "medium", "high", "urgent"]:
-            count = db.notifications.count_documents({"user_id": user_id, "priority": priority})
-            by_priority[priority] = count
+        priority_counts = {row["_id"]: row["count"] for row in result.get("by_priority", [])}
+        by_priority = {
+            priority: priority_counts.get(priority, 0)
+            for priority in ["low", "medium", "high", "urgent"]
+        }
         
         return {
             "total": total,
@@ -243,7 +343,7 @@ class NotificationService:
             
             # Get user email
             db = self.get_database()
-            user = db.users.find_one({"_id": ObjectId(user_id)})
+            user = await db.users.find_one({"_id": ObjectId(user_id)})
             
             if user and user.get("email"):
                 await send_notification_email(
@@ -255,30 +355,100 @@ class NotificationService:
                 
                 # Mark email as sent
                 if notification_id:
-                    db.notifications.update_one(
+                    await db.notifications.update_one(
                         {"_id": ObjectId(notification_id)},
                         {"$set": {"is_email_sent": True}}
                     )
                 
-                logger.info(f"Email sent to {user['email']}")
+                logger.debug(f"Email sent to {user['email']}")
         except Exception as e:
             logger.error(f"Error sending email: {e}")
     
+    async def send_bulk_email_notifications(
+        self,
+        user_ids: List[str],
+        title: str,
+        message: str,
+        action_url: Optional[str] = None,
+        notification_ids: Optional[List[str]] = None
+    ) -> int:
+        """
+        Email the same notification to many users.
+        Looks up all addresses in one query, sends concurrently and flags the
+        sent notifications with one update. Returns the number of emails sent.
+        """
+        try:
+            from app.services.email_service import send_notification_email
+        except Exception as e:
+            logger.error(f"Error sending email: {e}")
+            return 0
+        
+        db = self.get_database()
+        
+        emails = {
+            str(user["_id"]): user["email"]
+            async for user in db.users.find(
+                {"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}},
+                {"_id": 1, "email": 1}
+            )
+            if user.get("email")
+        }
+        
+        sem = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+        sent_notification_ids: List[ObjectId] = []
+        sent_count = 0
+        
+        async def _send(user_id: str, notification_id: Optional[str]):
+            nonlocal sent_count
+            email = emails.get(user_id)
+            if not email:
+                return
+            async with sem:
+                try:
+                    await send_notification_email(
+                        to_email=email,
+                        subject=title,
+                        message=message,
+                        action_url=action_url
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to send email to {user_id}: {e}")
+                    return
+            sent_count += 1
+            if notification_id:
+                sent_notification_ids.append(ObjectId(notification_id))
+        
+        paired_ids = notification_ids or [None] * len(user_ids)
+        await asyncio.gather(*[_send(u, n) for u, n in zip(user_ids, paired_ids)])
+        
+        # Mark emails as sent
+        if sent_notification_ids:
+            await db.notifications.update_many(
+                {"_id": {"$in": sent_notification_ids}},
+                {"$set": {"is_email_sent": True}}
+            )
+        
+        logger.info(f"Sent {sent_count}/{len(user_ids)} notification emails")
+        return sent_count
+    
     async def notify_new_job_posted(
         self,
         job_id: str,
         job_title: str,
         company_name: str,
         institution_id: str,
-        target_student_ids: Optional[List[str]] = None
+        target_student_ids: Optional[Iterable[str]] = None
     ):
         """Send notifications when a new job is posted"""
         db = self.get_database()
         
         # If no specific students, notify all active students
         if not target_student_ids:
-            students = db.users.find({"role": "student", "is_active": True})
-            target_student_ids = [str(s["_id"]) for s in students]
+            students = db.users.find(
+                {"role": "student", "is_active": True},
+                {"_id": 1}
+            ).batch_size(1000)
+            target_student_ids = [str(s["_id"]) async for s in students]
         
         title = f"New Job: {job_title}"
         message = f"{company_name} has posted a new job opportunity. Check it out!"
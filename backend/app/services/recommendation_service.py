@@ -14,14 +14,74 @@ Author: Virtual CDC Team
 Date: December 2024
 """
 
+import base64
+import json
 import logging
-from typing import Dict, List, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from app.db.mongo import get_database
+from app.db.mongo import get_async_database
+from app.services.embedding_service import to_bson_vector
 from bson import ObjectId
+from bson.binary import Binary, VECTOR_SUBTYPE
+from pymongo import UpdateOne
+from pymongo.operations import SearchIndexModel
 
 logger = logging.getLogger(__name__)
 
+# Student embedding lookups are reused across page requests for this long;
+# profile updates invalidate them explicitly
+STUDENT_EMBEDDING_TTL_SECONDS = 300
+STUDENT_EMBEDDING_CACHE_MAX = 10_000
+_student_embedding_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+# Atlas vector index over job embeddings. Scalar quantization keeps an int8
+# copy of each vector in the index (~4x less index RAM than float32) while
+# the stored float32 vectors stay available for full-fidelity scoring
+JOB_VECTOR_INDEX_DEFINITION = {
+    "fields": [
+        {
+            "type": "vector",
+            "path": "job_embedding",
+            "numDimensions": 384,
+            "similarity": "cosine",
+            "quantization": "scalar"
+        },
+        # Pre-filter fields usable in $vectorSearch.filter
+        {"type": "filter", "path": "is_active"},
+        {"type": "filter", "path": "status"}
+    ]
+}
+_VECTOR_FILTER_PATHS = {
+    f["path"] for f in JOB_VECTOR_INDEX_DEFINITION["fields"] if f["type"] == "filter"
+}
+
+# check_vector_search_status probes Atlas with a live query; reuse the answer
+VECTOR_STATUS_TTL_SECONDS = 30
+VECTOR_STATUS_NOT_READY_TTL_SECONDS = 5
+_vector_status_cache: Dict = {"expires": 0.0, "value": None}
+
+
+def invalidate_student_embedding(student_id: str) -> None:
+    """Drop a student's cached embedding (call after their profile changes)"""
+    _student_embedding_cache.pop(str(student_id), None)
+
+
+def _encode_cursor(job: Dict) -> str:
+    """Opaque keyset cursor pointing just past ``job`` in (score desc, _id asc) order"""
+    payload = {"last_score": job["similarity_score"], "last_id": str(job["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, ObjectId]:
+    """Inverse of _encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["last_score"]), ObjectId(payload["last_id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
 
 class RecommendationService:
     """
@@ -34,30 +94,77 @@ class RecommendationService:
     """
     
     def __init__(self):
-        self.db = None
         self.vector_index_name = "job_vector_index"  # MongoDB Atlas index name
     
     def _get_db(self):
-        """Get database connection"""
-        if self.db is None:
-            self.db = get_database()
-        return self.db
+        """Get (async) database connection for the running event loop"""
+        return get_async_database()
+    
+    async def _get_student_embedding(self, student_id: str) -> Optional[Dict]:
+        """
+        Get a student's profile embedding, branch and completion flag
+        
+        Served from a per-process TTL cache when possible. Returns None if
+        the student doesn't exist.
+        """
+        now = time.monotonic()
+        cached = _student_embedding_cache.get(student_id)
+        if cached is not None:
+            if now < cached[0]:
+                _student_embedding_cache.move_to_end(student_id)
+                return cached[1]
+            del _student_embedding_cache[student_id]
+        
+        student = await self._get_db().users.find_one(
+            {"_id": ObjectId(student_id)},
+            {"profile_embedding": 1, "profile_data.branch": 1, "profile_completed": 1}
+        )
+        if not student:
+            return None
+        
+        embedding = student.get("profile_embedding")
+        if embedding and not (isinstance(embedding, Binary) and embedding.subtype == VECTOR_SUBTYPE):
+            # Legacy list-of-doubles profile: pack once here so every
+            # $vectorSearch ships a 1.5KB float32 vector, not a 384-double array
+            embedding = to_bson_vector(embedding)
+        
+        info = {
+            "profile_embedding": embedding,
+            "branch": student.get("profile_data", {}).get("branch", "Unknown"),
+            "profile_completed": student.get("profile_completed", False)
+        }
+        
+        # Only cache usable embeddings so a freshly completed profile is
+        # picked up on the next request
+        if info["profile_embedding"]:
+            _student_embedding_cache[student_id] = (now + STUDENT_EMBEDDING_TTL_SECONDS, info)
+            if len(_student_embedding_cache) > STUDENT_EMBEDDING_CACHE_MAX:
+                _student_embedding_cache.popitem(last=False)
+        
+        return info
     
     async def get_jobs_for_student(
         self,
         student_id: str,
         page: int = 1,
         limit: int = 20,
-        min_score: float = 0.6
+        min_score: float = 0.6,
+        cursor: Optional[str] = None
     ) -> Dict:
         """
         Get paginated personalized job recommendations for a student
         
+        Offset paging (page numbers + total count) is used by default. When
+        a cursor from a previous response's ``next_cursor`` is passed, the
+        next page is fetched by seeking past the last seen
+        (similarity_score, _id) instead, without skipping or counting.
+        
         Args:
             student_id: MongoDB ObjectId of student
-            page: Page number (1-indexed)
+            page: Page number (1-indexed), ignored when cursor is given
             limit: Jobs per page (max 100)
             min_score: Minimum similarity score (0.0 to 1.0)
+            cursor: Keyset cursor returned as pagination.next_cursor
             
         Returns:
             {
@@ -68,7 +175,8 @@ class RecommendationService:
                     "total_count": 156,
                     "total_pages": 8,
                     "has_next": True,
-                    "has_prev": False
+                    "has_prev": False,
+                    "next_cursor": "eyJsYXN0X3Nj..."
                 },
                 "student_branch": "CSE",
                 "matching_strategy": "mongodb_vector_search"
@@ -77,28 +185,56 @@ class RecommendationService:
         try:
             db = self._get_db()
             
-            # Get student profile
-            student = db.users.find_one({"_id": ObjectId(student_id)})
+            keyset = None
+            if cursor:
+                try:
+                    keyset = _decode_cursor(cursor)
+                except ValueError as e:
+                    return {"error": str(e)}
+            
+            # Get student profile embedding
+            student = await self._get_student_embedding(student_id)
             
             if not student:
                 return {"error": "Student not found"}
             
             # Check if student has profile embedding
-            student_embedding = student.get("profile_embedding")
+            student_embedding = student["profile_embedding"]
             if not student_embedding:
                 return {
                     "error": "Profile embedding not found. Please complete your profile first.",
-                    "profile_completed": student.get("profile_completed", False)
+                    "profile_completed": student["profile_completed"]
                 }
             
-            student_data = student.get("profile_data", {})
-            student_branch = student_data.get("branch", "Unknown")
+            student_branch = student["branch"]
             
-            # Calculate number of candidates to search
+            if keyset:
+                # Keyset pages seek past the cursor, so a fixed candidate pool
+                # covers every page without growing with depth
+                search_limit = max(200, limit * 5)
+            else:
+                # Vector search must surface at least every job up to this page
+                search_limit = max(limit * 5, page * limit)
             # Search more candidates to ensure we have enough after filtering
-            num_candidates = max(200, limit * 10)
+            num_candidates = max(200, search_limit * 2)
+            
+            if keyset:
+                logger.info(f"Getting jobs for student {student_id} after cursor, limit {limit}")
+            else:
+                logger.info(f"Getting jobs for student {student_id}, page {page}, limit {limit}")
             
-            logger.info(f"Getting jobs for student {student_id}, page {page}, limit {limit}")
+            match_filter = {
+                "is_active": True,
+                "status": "active",
+                "similarity_score": {"$gte": min_score}
+            }
+            if keyset:
+                # Seek past the last job of the previous page
+                last_score, last_id = keyset
+                match_filter["$or"] = [
+                    {"similarity_score": {"$lt": last_score}},
+                    {"similarity_score": last_score, "_id": {"$gt": last_id}}
+                ]
             
             # MongoDB Vector Search Pipeline
             pipeline = [
@@ -109,74 +245,80 @@ class RecommendationService:
                         "path": "job_embedding",
                         "queryVector": student_embedding,  # Student profile embedding
                         "numCandidates": num_candidates,   # Search pool
-                        "limit": limit * 5                 # Get more for pagination
+                        "limit": search_limit              # Get more for pagination
                     }
                 },
                 
-                # STEP 2: Add similarity score
+                # STEP 2: Add similarity score (match percentage is derived
+                # from it while formatting)
                 {
-                    "$addFields": {
+                    "$set": {
                         "similarity_score": {"$meta": "vectorSearchScore"}
                     }
                 },
                 
                 # STEP 3: Filter by active status, job status, and minimum score
                 # NOTE: Using $match AFTER $vectorSearch (not filter inside)
-                {
-                    "$match": {
-                        "is_active": True,
-                        "status": "active",
-                        "similarity_score": {"$gte": min_score}
-                    }
-                },
-                
-                # STEP 4: Sort by score (highest first)
-                {
-                    "$sort": {"similarity_score": -1}
-                },
-                
-                # STEP 5: Calculate match percentage
-                {
-                    "$addFields": {
-                        "match_score": {
-                            "$toInt": {
-                                "$multiply": ["$similarity_score", 100]
-                            }
-                        }
-                    }
-                },
-                
-                # STEP 6: Project only needed fields
-                {
-                    "$project": {
-                        "_id": 1,
-                        "title": 1,
-                        "company": 1,
-                        "location": 1,
-                        "description": 1,
-                        "job_type": 1,
-                        "salary_range": 1,
-                        "experience_required": 1,
-                        "skills_required": 1,
-                        "source": 1,
-                        "job_url": 1,
-                        "posted_at": 1,
-                        "similarity_score": 1,
-                        "match_score": 1
-                    }
-                }
+                {"$match": match_filter}
             ]
             
-            # Execute aggregation
-            all_results = list(db.jobs.aggregate(pipeline))
+            # Project only needed fields
+            project_stage = {
+                "$project": {
+                    "_id": 1,
+                    "title": 1,
+                    "company": 1,
+                    "location": 1,
+                    "description": 1,
+                    "job_type": 1,
+                    "salary_range": 1,
+                    "experience_required": 1,
+                    "skills_required": 1,
+                    "source": 1,
+                    "job_url": 1,
+                    "posted_at": 1,
+                    "similarity_score": 1
+                }
+            }
+            
+            # STEP 4: Sort by score (highest first), _id breaks ties so
+            # the order is stable for both offset and keyset paging
+            pipeline.append({"$sort": {"similarity_score": -1, "_id": 1}})
             
-            total_count = len(all_results)
-            total_pages = (total_count + limit - 1) // limit if total_count > 0 else 0
+            if keyset:
+                # STEP 5: Next page only; one extra row tells us if there is more
+                pipeline.extend([{"$limit": limit + 1}, project_stage])
+                agg = await db.jobs.aggregate(pipeline)
+                paginated_results = await agg.to_list()
+                has_next = len(paginated_results) > limit
+                paginated_results = paginated_results[:limit]
+                total_count = None
+                total_pages = None
+            else:
+                # STEP 5: Paginate server-side; count all matches alongside
+                pipeline.append({
+                    "$facet": {
+                        "page": [
+                            {"$skip": (page - 1) * limit},
+                            {"$limit": limit},
+                            project_stage
+                        ],
+                        "meta": [{"$count": "total"}]
+                    }
+                })
+                
+                # Execute aggregation - a single document with the page + count
+                agg = await db.jobs.aggregate(pipeline)
+                docs = await agg.to_list(length=1)
+                result = docs[0] if docs else {}
+                paginated_results = result.get("page", [])
+                meta = result.get("meta") or [{}]
+                
+                total_count = meta[0].get("total", 0)
+                total_pages = (total_count + limit - 1) // limit if total_count > 0 else 0
+                has_next = page < total_pages
             
-            # Paginate results
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
-            paginated_results = all_results[start_idx:end_idx]
+            next_cursor = _encode_cursor(paginated_results[-1]) if has_next and paginated_results else None
             
             # Format jobs for response
             formatted_jobs = []
@@ -194,21 +336,25 @@ class RecommendationService:
                     "source": job.get("source", "unknown"),
                     "job_url": job.get("job_url", ""),
                     "posted_at": job.get("posted_at"),
-                    "match_score": job["match_score"],
+                    "match_score": int(job["similarity_score"] * 100),
                     "similarity": round(job["similarity_score"], 3)
                 })
             
-            logger.info(f"Found {total_count} jobs for student, returning page {page} ({len(formatted_jobs)} jobs)")
+            if keyset:
+                logger.info(f"Returning {len(formatted_jobs)} jobs for student after cursor")
+            else:
+                logger.info(f"Found {total_count} jobs for student, returning page {page} ({len(formatted_jobs)} jobs)")
             
             return {
                 "jobs": formatted_jobs,
                 "pagination": {
-                    "page": page,
+                    "page": None if keyset else page,
                     "limit": limit,
                     "total_count": total_count,
                     "total_pages": total_pages,
-                    "has_next": page < total_pages,
-                    "has_prev": page > 1
+                    "has_next": has_next,
+                    "has_prev": bool(keyset) or page > 1,
+                    "next_cursor": next_cursor
                 },
                 "student_branch": student_branch,
                 "matching_strategy": "mongodb_vector_search"
@@ -239,13 +385,13 @@ class RecommendationService:
         try:
             db = self._get_db()
             
-            # Get student profile
-            student = db.users.find_one({"_id": ObjectId(student_id)})
+            # Get student profile embedding
+            student = await self._get_student_embedding(student_id)
             
             if not student:
                 return {"error": "Student not found"}
             
-            student_embedding = student.get("profile_embedding")
+            student_embedding = student["profile_embedding"]
             if not student_embedding:
                 return {"error": "Profile embedding not found"}
             
@@ -262,26 +408,12 @@ class RecommendationService:
                         "limit": limit
                     }
                 },
-                {
-                    "$addFields": {
-                        "similarity_score": {"$meta": "vectorSearchScore"}
-                    }
-                },
                 {
                     "$match": {
                         "is_active": True,
                         "status": "active"
                     }
                 },
-                {
-                    "$addFields": {
-                        "match_score": {
-                            "$toInt": {
-                                "$multiply": ["$similarity_score", 100]
-                            }
-                        }
-                    }
-                },
                 {
                     "$project": {
                         "_id": 1,
@@ -289,13 +421,14 @@ class RecommendationService:
                         "company": 1,
                         "location": 1,
                         "job_type": 1,
-                        "match_score": 1,
+                        "similarity_score": {"$meta": "vectorSearchScore"},
                         "posted_at": 1
                     }
                 }
             ]
             
-            results = list(db.jobs.aggregate(pipeline))
+            agg = await db.jobs.aggregate(pipeline)
+            results = await agg.to_list()
             
             formatted_jobs = []
             for job in results:
@@ -305,7 +438,7 @@ class RecommendationService:
                     "company": job["company"],
                     "location": job["location"],
                     "job_type": job["job_type"],
-                    "match_score": job["match_score"],
+                    "match_score": int(job["similarity_score"] * 100),
                     "posted_at": job.get("posted_at")
                 })
             
@@ -331,11 +464,15 @@ class RecommendationService:
                 "index_name": "job_vector_index"
             }
         """
+        now = time.monotonic()
+        if _vector_status_cache["value"] is not None and now < _vector_status_cache["expires"]:
+            return _vector_status_cache["value"]
+        
         try:
             db = self._get_db()
             
             # Try a simple vector search
-            test_embedding = [0.1] * 384  # Dummy embedding
+            test_embedding = to_bson_vector([0.1] * 384)  # Dummy embedding
             
             pipeline = [
                 {
@@ -350,24 +487,30 @@ class RecommendationService:
                 {"$limit": 1}
             ]
             
-            list(db.jobs.aggregate(pipeline))
+            agg = await db.jobs.aggregate(pipeline)
+            await agg.to_list()
             
-            return {
+            status = {
                 "status": "ready",
                 "message": "✅ Vector Search is working!",
                 "index_name": self.vector_index_name
             }
+            _vector_status_cache.update(expires=now + VECTOR_STATUS_TTL_SECONDS, value=status)
+            return status
         
         except Exception as e:
             error_msg = str(e)
             
             if "index" in error_msg.lower():
-                return {
+                status = {
                     "status": "not_ready",
                     "message": "Vector search index not found or not ready",
                     "index_name": self.vector_index_name,
                     "error": error_msg
                 }
+                # Short TTL so a newly built index is noticed quickly
+                _vector_status_cache.update(expires=now + VECTOR_STATUS_NOT_READY_TTL_SECONDS, value=status)
+                return status
             else:
                 return {
                     "status": "error",
@@ -375,6 +518,86 @@ class RecommendationService:
                     "error": error_msg
                 }
 
+    
+    async def ensure_vector_index(self) -> Dict:
+        """
+        Create the job vector index, or bring an existing one in line with
+        JOB_VECTOR_INDEX_DEFINITION (Atlas rebuilds it in the background)
+        
+        Returns:
+            {"action": "created" | "updated" | "unchanged" | "error", ...}
+        """
+        try:
+            db = self._get_db()
+            
+            indexes = await db.jobs.list_search_indexes(self.vector_index_name)
+            existing = await indexes.to_list()
+            
+            if not existing:
+                await db.jobs.create_search_index(SearchIndexModel(
+                    definition=JOB_VECTOR_INDEX_DEFINITION,
+                    name=self.vector_index_name,
+                    type="vectorSearch"
+                ))
+                logger.info(f"✅ Created vector index {self.vector_index_name}")
+                return {"action": "created"}
+            
+            # Only quantization and filter fields are reconciled; Atlas
+            # normalizes the rest of the definition, so a full comparison
+            # would rebuild every boot
+            fields = existing[0].get("latestDefinition", {}).get("fields", [])
+            vector_field = next((f for f in fields if f.get("type") == "vector"), {})
+            filter_paths = {f.get("path") for f in fields if f.get("type") == "filter"}
+            if vector_field.get("quantization") != "scalar" or not _VECTOR_FILTER_PATHS <= filter_paths:
+                await db.jobs.update_search_index(self.vector_index_name, JOB_VECTOR_INDEX_DEFINITION)
+                logger.info(f"✅ Updated vector index {self.vector_index_name} (quantization/filter fields)")
+                return {"action": "updated"}
+            
+            return {"action": "unchanged"}
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Could not ensure vector index: {str(e)}")
+            return {"action": "error", "error": str(e)}
+    
+    async def migrate_legacy_job_embeddings(self, batch_size: int = 500) -> int:
+        """
+        Re-encode job embeddings still stored as arrays of doubles into
+        packed float32 BSON vectors
+        
+        Returns:
+            Number of jobs migrated
+        """
+        try:
+            db = self._get_db()
+            
+            migrated = 0
+            ops = []
+            async for job in db.jobs.find(
+                {"job_embedding": {"$type": "array"}},
+                {"job_embedding": 1}
+            ).batch_size(batch_size):
+                ops.append(UpdateOne(
+                    {"_id": job["_id"]},
+                    {"$set": {"job_embedding": to_bson_vector(job["job_embedding"])}}
+                ))
+                if len(ops) >= batch_size:
+                    await db.jobs.bulk_write(ops, ordered=False)
+                    migrated += len(ops)
+                    ops = []
+            
+            if ops:
+                await db.jobs.bulk_write(ops, ordered=False)
+                migrated += len(ops)
+            
+            if migrated:
+                logger.info(f"✅ Migrated {migrated} legacy job embeddings to float32 vectors")
+            
+            return migrated
+        
+        except Exception as e:
+            logger.error(f"❌ Error migrating job embeddings: {str(e)}")
+            return 0
+
 
 # Singleton instance
 recommendation_service = RecommendationService()
\ No newline at end of file
@@ -4,15 +4,63 @@ Path: backend/app/services/scraper_service.py
 Job Scraper Service - Uses JobSpy to scrape from Indeed, LinkedIn, ZipRecruiter
 """
 
+import asyncio
 import logging
+import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from jobspy import scrape_jobs
+from pymongo.errors import BulkWriteError
 from app.db.mongo import get_database
 from app.services.embedding_service import embedding_service
+from app.services._job_domains import job_domain_tags
+from app.services.search_service import invalidate_search_results
 
 logger = logging.getLogger(__name__)
 
+# Search terms scraped at once; keeps us under the job boards' rate limits
+SCRAPE_CONCURRENCY = 4
+
+# Common tech skills looked for in scraped job descriptions
+COMMON_SKILLS = (
+    "python", "java", "javascript", "react", "node.js", "angular", "vue",
+    "sql", "mongodb", "postgresql", "aws", "azure", "gcp", "docker", "kubernetes",
+    "machine learning", "deep learning", "tensorflow", "pytorch", "scikit-learn",
+    "html", "css", "typescript", "c++", "c#", "go", "rust", "ruby",
+    "django", "flask", "fastapi", "spring boot", "express.js",
+    "git", "jenkins", "ci/cd", "agile", "scrum", "jira"
+)
+
+# One pass over the description for all skills. Lookarounds instead of \b
+# so "c++" / "c#" match, and "go" / "java" don't match inside other words
+# (run against the lower-cased description)
+_SKILL_RE = re.compile(
+    r"(?<!\w)(" + "|".join(map(re.escape, COMMON_SKILLS)) + r")(?!\w)"
+)
+
+# Descriptions shorter than this can't meaningfully list skills
+MIN_SKILL_DESCRIPTION_LENGTH = 20
+
+# JobSpy columns read when normalizing, in the order of each row tuple
+# (title/company/location first - they're the dedupe key)
+JOB_ROW_FIELDS = (
+    "title", "company", "location", "description", "job_type", "job_level",
+    "job_url", "site", "date_posted", "min_amount", "max_amount", "interval", "currency"
+)
+
+# Values for JOB_ROW_FIELDS columns a scrape didn't return
+JOB_ROW_DEFAULTS = {
+    "title": "Unknown Title",
+    "company": "Unknown Company",
+    "location": "Unknown Location",
+    "description": "",
+    "job_level": "Not specified",
+    "job_url": "",
+    "site": "unknown",
+    "interval": "",
+    "currency": "INR"
+}
+
 
 class JobScraperService:
     """Service for scraping and storing job postings"""
@@ -50,8 +98,10 @@ class JobScraperService:
         try:
             logger.info(f"🔍 Scraping jobs for: '{search_term}' in {location}")
             
-            # Use JobSpy to scrape from multiple sources
-            jobs_df = scrape_jobs(
+            # Use JobSpy to scrape from multiple sources (blocking HTTP -
+            # run it in a worker thread so the event loop stays free)
+            jobs_df = await asyncio.to_thread(
+                scrape_jobs,
                 site_name=["indeed", "linkedin", "zip_recruiter"],
                 search_term=search_term,
                 location=location,
@@ -75,13 +125,11 @@ class JobScraperService:
             total_scraped = len(jobs_df)
             logger.info(f"✅ Scraped {total_scraped} jobs for '{search_term}'")
             
-            # Convert to list of dicts
-            jobs_list = jobs_df.to_dict('records')
-            
             return {
                 "search_term": search_term,
                 "total_scraped": total_scraped,
-                "jobs": jobs_list
+                # Rows are produced lazily and normalized as they're stored
+                "jobs": self._iter_job_rows(jobs_df)
             }
             
         except Exception as e:
@@ -92,103 +140,153 @@ class JobScraperService:
                 "error": str(e)
             }
     
-    async def store_job(self, job_data: Dict) -> Optional[str]:
+    @staticmethod
+    def _iter_job_rows(jobs_df) -> Iterator[Tuple]:
+        """Yield one JOB_ROW_FIELDS-ordered tuple per DataFrame row without materializing them all"""
+        missing = {field: JOB_ROW_DEFAULTS.get(field) for field in JOB_ROW_FIELDS if field not in jobs_df.columns}
+        if missing:
+            jobs_df = jobs_df.assign(**missing)
+        
+        yield from jobs_df[list(JOB_ROW_FIELDS)].itertuples(index=False, name=None)
+    
+    @staticmethod
+    def _dedupe_key(row: Tuple) -> Tuple[str, str, str]:
+        """Case/whitespace-insensitive (title, company, location) identity of a scraped row"""
+        return tuple(str(value or "").strip().lower() for value in row[:3])
+    
+    async def store_jobs_bulk(
+        self,
+        jobs: Iterable[Tuple],
+        seen: Optional[Set[Tuple[str, str, str]]] = None
+    ) -> Dict:
         """
-        Store a single job in the database with embedding
+        Store many scraped jobs with one embedding batch and one insert
+        
+        Jobs already in the database are rejected by the unique
+        (title, company, location) index and counted as duplicates.
         
         Args:
-            job_data: Job data from scraper
-            
+            jobs: JOB_ROW_FIELDS-ordered rows from the scraper
+            seen: Dedupe keys already handled; shared across calls so the
+                same posting from another site or search term is skipped
+        
         Returns:
-            Job ID if successful, None if duplicate or error
+            {"saved": int, "duplicates": int, "failed": int}
         """
+        result = {"saved": 0, "duplicates": 0, "failed": 0}
+        new_docs = []
+        
         try:
             db = self._get_db()
             
-            # Extract and normalize job data
-            job_doc = self._normalize_job_data(job_data)
-            
-            # Check for duplicates
-            existing = db.jobs.find_one({
-                "title": job_doc["title"],
-                "company": job_doc["company"],
-                "location": job_doc["location"]
-            })
-            
-            if existing:
-                logger.debug(f"Duplicate job: {job_doc['title']} at {job_doc['company']}")
-                return None
-            
-            # Generate embedding for the job
+            # Drop cross-site duplicates before doing any work on them
+            if seen is None:
+                seen = set()
+            for job in jobs:
+                key = self._dedupe_key(job)
+                if key in seen:
+                    result["duplicates"] += 1
+                    continue
+                seen.add(key)
+                
+                # One malformed row shouldn't cost the rest of the batch
+                try:
+                    new_docs.append(self._normalize_job_data(job))
+                except Exception as e:
+                    logger.warning(f"Skipping malformed job row: {str(e)}")
+                    result["failed"] += 1
+            
+            if not new_docs:
+                return result
+            
+            # Generate all embeddings in a single batch
             try:
-                embedding = await embedding_service.generate_job_embedding(job_doc)
-                job_doc["job_embedding"] = embedding
-                job_doc["embedding_generated_at"] = datetime.utcnow()
-                job_doc["embedding_model"] = embedding_service.model_name
+                embeddings = await embedding_service.generate_job_embeddings_batch(new_docs)
+                generated_at = datetime.utcnow()
+                for job_doc, embedding in zip(new_docs, embeddings):
+                    job_doc["job_embedding"] = embedding
+                    job_doc["embedding_generated_at"] = generated_at
+                    job_doc["embedding_model"] = embedding_service.model_name
             except Exception as e:
-                logger.warning(f"Failed to generate embedding for job: {str(e)}")
-                # Continue without embedding
-                job_doc["job_embedding"] = None
-            
-            # Insert into database
-            result = db.jobs.insert_one(job_doc)
-            
-            logger.debug(f"✅ Saved job: {job_doc['title']} at {job_doc['company']}")
-            
-            return str(result.inserted_id)
+                logger.warning(f"Failed to generate embeddings for {len(new_docs)} jobs: {str(e)}")
+                # Continue without embeddings
+                for job_doc in new_docs:
+                    job_doc["job_embedding"] = None
             
+            # Insert into database; unordered so one duplicate doesn't stop the rest
+            try:
+                insert_result = db.jobs.insert_many(new_docs, ordered=False)
+                result["saved"] = len(insert_result.inserted_ids)
+            except BulkWriteError as bwe:
+                details = bwe.details
+                result["saved"] = details.get("nInserted", 0)
+                for error in details.get("writeErrors", []):
+                    if error.get("code") == 11000:
+                        result["duplicates"] += 1
+                    else:
+                        result["failed"] += 1
+            
+            logger.debug(f"✅ Saved {result['saved']} jobs")
+            
+            return result
+        
         except Exception as e:
-            logger.error(f"❌ Error storing job: {str(e)}")
-            return None
+            logger.error(f"❌ Error storing jobs: {str(e)}")
+            # Only rows that got as far as the insert and weren't saved
+            result["failed"] += len(new_docs) - result["saved"]
+            return result
     
-    def _normalize_job_data(self, raw_job: Dict) -> Dict:
+    def _normalize_job_data(self, row: Tuple) -> Dict:
         """
         Normalize job data from scraper to database format
         
         Args:
-            raw_job: Raw job data from JobSpy
+            row: JobSpy row, JOB_ROW_FIELDS-ordered
             
         Returns:
             Normalized job document
         """
+        (title, company, location, description, job_type, job_level,
+         job_url, site, date_posted, min_amount, max_amount, interval, currency) = row
+        
         # Map JobSpy fields to our database schema
         now = datetime.utcnow()
         
         job_doc = {
             # Basic info
-            "title": raw_job.get("title", "Unknown Title"),
-            "company": raw_job.get("company", "Unknown Company"),
-            "location": raw_job.get("location", "Unknown Location"),
+            "title": title,
+            "company": company,
+            "location": location,
             
             # Description
-            "description": raw_job.get("description", ""),
+            "description": description,
             
             # Job details
-            "job_type": self._normalize_job_type(raw_job.get("job_type")),
-            "salary_range": self._extract_salary(raw_job),
-            "experience_required": raw_job.get("job_level", "Not specified"),
+            "job_type": self._normalize_job_type(job_type),
+            "salary_range": self._extract_salary(min_amount, max_amount, interval, currency),
+            "experience_required": job_level,
             
             # Skills (extract from description if available)
-            "skills_required": self._extract_skills(raw_job),
+            "skills_required": self._extract_skills(description),
             
             # Links
-            "job_url": raw_job.get("job_url", ""),
-            "source": raw_job.get("site", "unknown"),
+            "job_url": job_url,
+            "source": site,
             
             # Metadata
-            "posted_at": self._parse_date_posted(raw_job.get("date_posted")),
+            "posted_at": self._parse_date_posted(date_posted),
             "scraped_at": now,
             "is_active": True,
             "status": "active",
             
             # Counters
             "views_count": 0,
-            "applications_count": 0,
-            
-            # Raw data for reference
-            "raw_data": raw_job
+            "applications_count": 0
         }
         
+        # Branch domains for get_jobs_by_domain
+        job_doc["domain_tags"] = job_domain_tags(job_doc)
+        
         return job_doc
     
     def _normalize_job_type(self, job_type: Optional[str]) -> str:
@@ -207,13 +305,8 @@ class JobScraperService:
         else:
             return "full_time"
     
-    def _extract_salary(self, raw_job: Dict) -> str:
+    def _extract_salary(self, min_salary, max_salary, interval: str, currency: str) -> str:
         """Extract and format salary information"""
-        min_salary = raw_job.get("min_amount")
-        max_salary = raw_job.get("max_amount")
-        interval = raw_job.get("interval", "")
-        currency = raw_job.get("currency", "INR")
-        
         if min_salary and max_salary:
             return f"{currency} {min_salary:,.0f} - {max_salary:,.0f} {interval}"
         elif min_salary:
@@ -223,21 +316,16 @@ class JobScraperService:
         else:
             return "Not specified"
     
-    def _extract_skills(self, raw_job: Dict) -> str:
+    def _extract_skills(self, description: Optional[str]) -> str:
         """Extract skills from job description"""
-        description = raw_job.get("description", "").lower()
+        # Skip the scan for missing (None / NaN from pandas) or stub descriptions
+        if not isinstance(description, str) or len(description) < MIN_SKILL_DESCRIPTION_LENGTH:
+            return "See description"
         
-        # Common tech skills
-        common_skills = [
-            "python", "java", "javascript", "react", "node.js", "angular", "vue",
-            "sql", "mongodb", "postgresql", "aws", "azure", "gcp", "docker", "kubernetes",
-            "machine learning", "deep learning", "tensorflow", "pytorch", "scikit-learn",
-            "html", "css", "typescript", "c++", "c#", "go", "rust", "ruby",
-            "django", "flask", "fastapi", "spring boot", "express.js",
-            "git", "jenkins", "ci/cd", "agile", "scrum", "jira"
-        ]
+        matched = set(_SKILL_RE.findall(description.lower()))
         
-        found_skills = [skill for skill in common_skills if skill in description]
+        # Keep the COMMON_SKILLS order for stable output
+        found_skills = [skill for skill in COMMON_SKILLS if skill in matched] if matched else []
         
         return ", ".join(found_skills) if found_skills else "See description"
     
@@ -278,19 +366,24 @@ class JobScraperService:
             "by_term": {}
         }
         
-        for search_term in search_terms:
-            logger.info(f"\n{'='*60}")
-            logger.info(f"🔍 Processing: {search_term}")
-            logger.info(f"{'='*60}")
-            
-            # Scrape jobs for this search term
-            scrape_result = await self.scrape_jobs(
-                search_term=search_term,
-                location=location,
-                results_wanted=results_per_term,
-                hours_old=72
-            )
-            
+        sem = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+        seen: Set[Tuple[str, str, str]] = set()
+        
+        async def _scrape_term(search_term: str) -> Dict:
+            async with sem:
+                logger.info(f"🔍 Processing: {search_term}")
+                return await self.scrape_jobs(
+                    search_term=search_term,
+                    location=location,
+                    results_wanted=results_per_term,
+                    hours_old=72
+                )
+        
+        # Scrape all search terms concurrently
+        scrape_results = await asyncio.gather(*(_scrape_term(term) for term in search_terms))
+        
+        # Store results term by term
+        for search_term, scrape_result in zip(search_terms, scrape_results):
             if "error" in scrape_result:
                 stats["by_term"][search_term] = {
                     "scraped": 0,
@@ -301,38 +394,38 @@ class JobScraperService:
                 continue
             
             jobs = scrape_result.get("jobs", [])
-            scraped_count = len(jobs)
-            saved_count = 0
-            duplicate_count = 0
+            scraped_count = scrape_result["total_scraped"]
             
-            # Store each job
-            for job in jobs:
-                job_id = await self.store_job(job)
-                if job_id:
-                    saved_count += 1
-                else:
-                    duplicate_count += 1
+            # Store all jobs for this term in one batch
+            stored = await self.store_jobs_bulk(jobs, seen=seen)
+            saved_count = stored["saved"]
+            duplicate_count = stored["duplicates"]
             
             # Update stats
             stats["total_scraped"] += scraped_count
             stats["total_saved"] += saved_count
             stats["total_duplicates"] += duplicate_count
+            stats["total_failed"] += stored["failed"]
             
             stats["by_term"][search_term] = {
                 "scraped": scraped_count,
                 "saved": saved_count,
-                "duplicates": duplicate_count
+                "duplicates": duplicate_count,
+                "failed": stored["failed"]
             }
             
             logger.info(f"✅ {search_term}: Scraped {scraped_count}, Saved {saved_count}, Duplicates {duplicate_count}")
         
-        logger.info(f"\n{'='*60}")
-        logger.info(f"📊 TOTAL SUMMARY")
-        logger.info(f"{'='*60}")
-        logger.info(f"Total Scraped: {stats['total_scraped']}")
-        logger.info(f"✅ Total Saved: {stats['total_saved']}")
-        logger.info(f"🔄 Total Duplicates: {stats['total_duplicates']}")
-        logger.info(f"{'='*60}\n")
+        # New jobs should show up in searches without waiting out the cache
+        if stats["total_saved"]:
+            invalidate_search_results()
+        
+        # job_scheduler logs the one summary record per run at INFO
+        logger.debug(
+            "📊 Scrape totals: scraped=%d saved=%d duplicates=%d failed=%d",
+            stats["total_scraped"], stats["total_saved"],
+            stats["total_duplicates"], stats["total_failed"]
+        )
         
         return stats
     
@@ -361,46 +454,74 @@ class JobScraperService:
             
             logger.info(f"🗑️ Deleted {deleted_count} jobs older than {days_old} days")
             
+            if deleted_count:
+                invalidate_search_results()
+            
             return deleted_count
             
         except Exception as e:
             logger.error(f"❌ Error cleaning up old jobs: {str(e)}")
             return 0
     
+    async def strip_legacy_raw_data(self) -> int:
+        """
+        One-time migration: jobs no longer carry the raw JobSpy row; strip it
+        from (bookmarked) survivors scraped before that change
+        
+        Returns:
+            Number of jobs updated
+        """
+        try:
+            db = self._get_db()
+            
+            result = db.jobs.update_many({"raw_data": {"$exists": True}}, {"$unset": {"raw_data": ""}})
+            
+            if result.modified_count:
+                logger.info(f"✅ Stripped raw_data from {result.modified_count} legacy jobs")
+            
+            return result.modified_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error stripping legacy raw_data: {str(e)}")
+            return 0
+    
     async def get_scraping_stats(self) -> Dict:
         """Get statistics about scraped jobs"""
         try:
             db = self._get_db()
             
-            total_jobs = db.jobs.count_documents({})
-            active_jobs = db.jobs.count_documents({"is_active": True})
-            
-            # Jobs by source
-            pipeline = [
-                {"$group": {"_id": "$source", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]
-            by_source = list(db.jobs.aggregate(pipeline))
+            yesterday = datetime.utcnow() - timedelta(hours=24)
             
-            # Jobs by type
+            # All counts and breakdowns in one pass over the collection
             pipeline = [
-                {"$group": {"_id": "$job_type", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
+                {"$project": {"_id": 0, "is_active": 1, "scraped_at": 1, "source": 1, "job_type": 1}},
+                {"$facet": {
+                    "total": [{"$count": "n"}],
+                    "active": [{"$match": {"is_active": True}}, {"$count": "n"}],
+                    # Recent jobs (last 24 hours)
+                    "recent": [{"$match": {"scraped_at": {"$gte": yesterday}}}, {"$count": "n"}],
+                    "by_source": [
+                        {"$group": {"_id": "$source", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}}
+                    ],
+                    "by_type": [
+                        {"$group": {"_id": "$job_type", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}}
+                    ]
+                }}
             ]
-            by_type = list(db.jobs.aggregate(pipeline))
+            result = next(db.jobs.aggregate(pipeline), {})
             
-            # Recent jobs (last 24 hours)
-            yesterday = datetime.utcnow() - timedelta(hours=24)
-            recent_jobs = db.jobs.count_documents({
-                "scraped_at": {"$gte": yesterday}
-            })
+            def _count(facet: str) -> int:
+                rows = result.get(facet) or [{}]
+                return rows[0].get("n", 0)
             
             return {
-                "total_jobs": total_jobs,
-                "active_jobs": active_jobs,
-                "recent_jobs_24h": recent_jobs,
-                "by_source": by_source,
-                "by_type": by_type
+                "total_jobs": _count("total"),
+                "active_jobs": _count("active"),
+                "recent_jobs_24h": _count("recent"),
+                "by_source": result.get("by_source", []),
+                "by_type": result.get("by_type", [])
             }
             
         except Exception as e:
@@ -5,15 +5,161 @@ MongoDB Vector Search Service - Direct Atlas Vector Search
 No manual cosine similarity, uses MongoDB native $vectorSearch
 """
 
+import asyncio
+import base64
+import copy
+import json
 import logging
-from typing import List, Dict, Optional
+import re
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-from app.db.mongo import get_database
+from app.db.mongo import get_async_database, get_database
 from app.services.embedding_service import embedding_service
+from app.services._job_domains import DOMAIN_KEYWORDS, DOMAIN_REGEX_PATTERNS, branch_domain
 from bson import ObjectId
+from pymongo.operations import SearchIndexModel
 
 logger = logging.getLogger(__name__)
 
+# Query embeddings kept per process (LRU); popular searches skip the model
+QUERY_EMBEDDING_CACHE_MAX = 2048
+
+# Finished semantic_job_search responses, reused for identical searches
+# for a short while (popular queries repeat across users within seconds)
+SEARCH_RESULT_TTL_SECONDS = 60
+SEARCH_RESULT_CACHE_MAX = 1024
+_search_result_cache: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+
+# Atlas Search (full-text) index over job text, the lexical side of
+# hybrid_job_search; status is a token so it can be filtered with equals
+JOB_TEXT_INDEX_NAME = "job_text_index"
+JOB_TEXT_INDEX_DEFINITION = {
+    "mappings": {
+        "dynamic": False,
+        "fields": {
+            "title": {"type": "string"},
+            "description": {"type": "string"},
+            "skills_required": {"type": "string"},
+            "is_active": {"type": "boolean"},
+            "status": {"type": "token"}
+        }
+    }
+}
+
+# Reciprocal rank fusion weights for hybrid_job_search
+HYBRID_WEIGHTS = {"vector": 0.7, "text": 0.3}
+
+# check_vector_index_status answers are reused (health checks poll it);
+# "missing"/"building" expire sooner so a finished index is noticed quickly
+INDEX_STATUS_TTL_SECONDS = 30
+INDEX_STATUS_NOT_READY_TTL_SECONDS = 5
+
+# Model calls allowed at once for query embeddings (bursts queue behind this)
+EMBEDDING_CONCURRENCY = 8
+
+# $vectorSearch candidate pool: ~10-20x limit is the Atlas recall sweet spot
+NUM_CANDIDATES_MULTIPLIER = 10
+NUM_CANDIDATES_FLOOR = 150
+NUM_CANDIDATES_MAX = 10_000  # Atlas hard limit
+
+
+def invalidate_search_results() -> None:
+    """Drop cached search responses (call after jobs are stored, changed or removed)"""
+    _search_result_cache.clear()
+
+
+def _normalize_query(query: str) -> str:
+    """Lower-case and collapse whitespace (the MiniLM tokenizer is uncased)"""
+    return " ".join(query.lower().split())
+
+
+@lru_cache(maxsize=64)
+def _resolve_branch(branch_lower: str) -> Tuple[Optional[str], Tuple[str, ...], str]:
+    """(domain, keywords, regex pattern) for a lower-cased branch name"""
+    domain = branch_domain(branch_lower)
+    if domain:
+        return domain, tuple(DOMAIN_KEYWORDS[domain]), DOMAIN_REGEX_PATTERNS[domain]
+    return None, (branch_lower,), re.escape(branch_lower)
+
+
+def _encode_domain_cursor(job: Dict) -> str:
+    """Opaque keyset cursor pointing just past ``job`` in (posted_at desc, _id desc) order"""
+    payload = {"last_posted_at": job["posted_at"].isoformat(), "last_id": str(job["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_domain_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of _encode_domain_cursor; raises ValueError on a malformed cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["last_posted_at"]), ObjectId(payload["last_id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _search_result_stage(detailed: bool, fused: bool = False) -> Dict:
+    """
+    $project that shapes vector search hits into API results server-side
+    
+    Truncates descriptions and stringifies ids in Mongo, so full
+    descriptions never cross the wire. Defaults match the old Python-side
+    formatting. ``detailed`` adds experience, job URL and raw similarity.
+    ``fused`` results (rank fusion) carry fusion_score instead: RRF scores
+    order results but aren't similarities, so there's no match percentage.
+    """
+    project = {
+        "_id": 0,
+        "id": {"$toString": "$_id"},
+        "title": 1,
+        "company": 1,
+        "location": 1,
+        "description": {"$concat": [{"$substrCP": [{"$ifNull": ["$description", ""]}, 0, 300]}, "..."]},
+        "skills_required": {"$ifNull": ["$skills_required", ""]},
+        "job_type": 1,
+        "salary_range": {"$ifNull": ["$salary_range", ""]},
+        "posted_at": 1,
+        "source": {"$ifNull": ["$source", "unknown"]}
+    }
+    if fused:
+        project["fusion_score"] = {"$round": ["$search_score", 4]}
+    else:
+        # $toInt truncates, like int() did
+        project["match_score"] = {"$toInt": {"$multiply": ["$search_score", 100]}}
+    if detailed:
+        project.update({
+            "experience_required": {"$ifNull": ["$experience_required", ""]},
+            "job_url": {"$ifNull": ["$job_url", ""]}
+        })
+        if not fused:
+            project["similarity"] = {"$round": ["$search_score", 3]}
+    return {"$project": project}
+
+
+def _format_domain_job(job: Dict) -> Dict:
+    """API shape for a get_jobs_by_domain row"""
+    g = job.get
+    return {
+        "id": str(job["_id"]),
+        "title": job["title"],
+        "company": job["company"],
+        "location": job["location"],
+        "description": job["description"],
+        "job_type": job["job_type"],
+        "salary_range": g("salary_range", ""),
+        "posted_at": job["posted_at"],
+        "source": g("source", "unknown")
+    }
+
+
+def _num_candidates(limit: int, num_candidates: Optional[int], multiplier: int) -> int:
+    """Candidate pool size for a $vectorSearch returning ``limit`` results"""
+    nc = num_candidates or max(NUM_CANDIDATES_FLOOR, limit * multiplier)
+    return min(max(nc, limit), NUM_CANDIDATES_MAX)
+
 
 class SearchService:
     """MongoDB Atlas Vector Search for semantic job search"""
@@ -21,6 +167,20 @@ class SearchService:
     def __init__(self):
         self.db = None
         self.vector_index_name = "job_vector_index"
+        
+        # (model version salt, normalized query) -> embedding
+        self._query_embeddings: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._query_cache_hits = 0
+        self._query_cache_misses = 0
+        
+        # Bounded model concurrency + in-flight query embeddings, so a burst
+        # of identical searches shares a single model call. Kept per event
+        # loop (like the async Mongo clients): futures can't cross loops
+        self._loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, Dict[Tuple, asyncio.Future]]]" = weakref.WeakKeyDictionary()
+        
+        # check_vector_index_status answer, cached briefly
+        self._index_status: Optional[Dict] = None
+        self._index_status_expires = 0.0
     
     def _get_db(self):
         """Get database connection"""
@@ -28,11 +188,81 @@ class SearchService:
             self.db = get_database()
         return self.db
     
+    def _get_async_db(self):
+        """Get async database connection for the running event loop (doesn't block it)"""
+        return get_async_database()
+    
+    def _embedding_state(self) -> Tuple[asyncio.Semaphore, Dict[Tuple, "asyncio.Future"]]:
+        """Model-call semaphore and in-flight query embeddings for the running loop"""
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = self._loop_state[loop] = (asyncio.Semaphore(EMBEDDING_CONCURRENCY), {})
+        return state
+    
+    async def _embed_query(self, query: str):
+        """
+        Embed a search query, reusing cached embeddings for repeat queries
+        
+        The query is lower-cased and whitespace-collapsed first (the MiniLM
+        tokenizer is uncased, so the embedding is the same). The key is
+        salted with the model settings so a model change never serves
+        stale vectors. Concurrent misses for the same query wait on one
+        model call instead of each encoding it.
+        """
+        normalized = _normalize_query(query)
+        key = (embedding_service.model_name, embedding_service.max_seq_length, normalized)
+        
+        cached = self._query_embeddings.get(key)
+        if cached is not None:
+            self._query_embeddings.move_to_end(key)
+            self._query_cache_hits += 1
+            return cached
+        
+        self._query_cache_misses += 1
+        _, inflight_by_key = self._embedding_state()
+        inflight = inflight_by_key.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._generate_query_embedding(key, normalized))
+            inflight_by_key[key] = inflight
+        
+        # Shielded so one cancelled caller doesn't cancel the shared call
+        return await asyncio.shield(inflight)
+    
+    async def _generate_query_embedding(self, key: Tuple, text: str):
+        """Run one model call for a cache miss and cache the result"""
+        embed_sem, inflight_by_key = self._embedding_state()
+        try:
+            async with embed_sem:
+                embedding = await embedding_service.generate_text_embedding(text)
+            
+            self._query_embeddings[key] = embedding
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_MAX:
+                self._query_embeddings.popitem(last=False)
+            
+            return embedding
+        finally:
+            inflight_by_key.pop(key, None)
+    
+    def get_query_cache_stats(self) -> Dict:
+        """Hit rate of the query embedding cache"""
+        lookups = self._query_cache_hits + self._query_cache_misses
+        return {
+            "size": len(self._query_embeddings),
+            "max_size": QUERY_EMBEDDING_CACHE_MAX,
+            "hits": self._query_cache_hits,
+            "misses": self._query_cache_misses,
+            "hit_rate": round(self._query_cache_hits / lookups, 3) if lookups else 0.0,
+            "inflight": sum(len(inflight_by_key) for _, inflight_by_key in list(self._loop_state.values()))
+        }
+    
     async def semantic_job_search(
         self, 
         query: str,
         limit: int = 50,
-        min_score: float = 0.5
+        min_score: float = 0.5,
+        num_candidates: Optional[int] = None,
+        candidates_multiplier: int = NUM_CANDIDATES_MULTIPLIER
     ) -> Dict:
         """
         Semantic search using MongoDB Atlas Vector Search
@@ -41,19 +271,35 @@ class SearchService:
             query: User's search query (e.g., "python backend developer bangalore")
             limit: Number of results to return
             min_score: Minimum similarity score (0.0 to 1.0)
+            num_candidates: Explicit ANN candidate pool (overrides the multiplier)
+            candidates_multiplier: Candidate pool as a multiple of limit
             
         Returns:
             Dict with search results and metadata
         """
+        cache_key = (
+            embedding_service.model_name, embedding_service.max_seq_length,
+            _normalize_query(query), limit, min_score,
+            _num_candidates(limit, num_candidates, candidates_multiplier)
+        )
+        now = time.monotonic()
+        cached = _search_result_cache.get(cache_key)
+        if cached is not None:
+            if now < cached[0]:
+                _search_result_cache.move_to_end(cache_key)
+                # Callers get their own copy; the cached response is shared
+                return copy.deepcopy(cached[1])
+            del _search_result_cache[cache_key]
+        
         try:
-            db = self._get_db()
+            db = self._get_async_db()
             
-            logger.info(f"Semantic search query: '{query}'")
+            logger.info("Semantic search query: %r", query)
             
-            # 1. Generate embedding for search query (direct text)
-            query_embedding = await embedding_service.generate_text_embedding(query)
+            # 1. Generate embedding for search query (direct text, cached)
+            query_embedding = await self._embed_query(query)
             
-            logger.info(f"Generated query embedding: {len(query_embedding)} dimensions")
+            logger.debug("Generated query embedding: %d dimensions", embedding_service.embedding_dim)
             
             # 2. MongoDB Vector Search using $vectorSearch
             pipeline = [
@@ -62,8 +308,11 @@ class SearchService:
                         "index": self.vector_index_name,
                         "path": "job_embedding",
                         "queryVector": query_embedding,
-                        "numCandidates": limit * 4,
-                        "limit": limit
+                        "numCandidates": _num_candidates(limit, num_candidates, candidates_multiplier),
+                        "limit": limit,
+                        # Pre-filter inside the ANN walk so inactive jobs
+                        # don't use up candidate slots
+                        "filter": {"is_active": True, "status": "active"}
                     }
                 },
                 {
@@ -73,59 +322,29 @@ class SearchService:
                 },
                 {
                     "$match": {
-                        "is_active": True,
-                        "status": "active",
                         "search_score": {"$gte": min_score}
                     }
                 },
-                {
-                    "$project": {
-                        "_id": 1,
-                        "title": 1,
-                        "company": 1,
-                        "location": 1,
-                        "description": 1,
-                        "skills_required": 1,
-                        "job_type": 1,
-                        "experience_required": 1,
-                        "salary_range": 1,
-                        "posted_at": 1,
-                        "source": 1,
-                        "job_url": 1,
-                        "search_score": 1
-                    }
-                }
+                _search_result_stage(detailed=True)
             ]
             
-            results = list(db.jobs.aggregate(pipeline))
-            
-            logger.info(f"Found {len(results)} results for query: '{query}'")
-            
-            # 3. Format results
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id": str(result["_id"]),
-                    "title": result["title"],
-                    "company": result["company"],
-                    "location": result["location"],
-                    "description": result.get("description", "")[:300] + "...",
-                    "skills_required": result.get("skills_required", ""),
-                    "job_type": result["job_type"],
-                    "experience_required": result.get("experience_required", ""),
-                    "salary_range": result.get("salary_range", ""),
-                    "posted_at": result["posted_at"],
-                    "source": result.get("source", "unknown"),
-                    "job_url": result.get("job_url", ""),
-                    "match_score": int(result["search_score"] * 100),
-                    "similarity": round(result["search_score"], 3)
-                })
+            # 3. Results come back already formatted by the $project stage
+            cursor = await db.jobs.aggregate(pipeline)
+            formatted_results = await cursor.to_list(length=limit)
             
-            return {
+            logger.info("Found %d results for query: %r", len(formatted_results), query)
+            
+            response = {
                 "query": query,
                 "total_results": len(formatted_results),
                 "results": formatted_results
             }
+            
+            _search_result_cache[cache_key] = (now + SEARCH_RESULT_TTL_SECONDS, response)
+            if len(_search_result_cache) > SEARCH_RESULT_CACHE_MAX:
+                _search_result_cache.popitem(last=False)
+            
+            return copy.deepcopy(response)
         
         except Exception as e:
             logger.error(f"Error in semantic search: {str(e)}")
@@ -136,39 +355,151 @@ class SearchService:
                 "results": []
             }
     
+    async def hybrid_job_search(
+        self,
+        query: str,
+        limit: int = 50,
+        num_candidates: Optional[int] = None,
+        candidates_multiplier: int = NUM_CANDIDATES_MULTIPLIER
+    ) -> Dict:
+        """
+        Hybrid search: vector similarity and full-text relevance fused in
+        one Atlas $rankFusion pipeline
+        
+        Queries like "python backend intern bangalore" carry both meaning
+        and literal terms (a city, a framework); ranking on both beats
+        either alone. Fusion and de-duplication happen server-side, with
+        one embedding call per query. Falls back to semantic_job_search when
+        the cluster can't run it (no text index, or MongoDB < 8.0).
+        
+        Args:
+            query: User's search query
+            limit: Number of results to return
+            num_candidates / candidates_multiplier: ANN candidate pool, as in
+                semantic_job_search
+        """
+        try:
+            db = self._get_async_db()
+            
+            query_embedding = await self._embed_query(query)
+            
+            active = {"is_active": True, "status": "active"}
+            pipeline = [
+                {
+                    "$rankFusion": {
+                        "input": {
+                            "pipelines": {
+                                "vector": [
+                                    {
+                                        "$vectorSearch": {
+                                            "index": self.vector_index_name,
+                                            "path": "job_embedding",
+                                            "queryVector": query_embedding,
+                                            "numCandidates": _num_candidates(limit, num_candidates, candidates_multiplier),
+                                            "limit": limit,
+                                            "filter": active
+                                        }
+                                    }
+                                ],
+                                "text": [
+                                    {
+                                        "$search": {
+                                            "index": JOB_TEXT_INDEX_NAME,
+                                            "compound": {
+                                                "must": [{
+                                                    "text": {
+                                                        "query": query,
+                                                        "path": ["title", "description", "skills_required"]
+                                                    }
+                                                }],
+                                                "filter": [
+                                                    {"equals": {"path": "is_active", "value": True}},
+                                                    {"equals": {"path": "status", "value": "active"}}
+                                                ]
+                                            }
+                                        }
+                                    },
+                                    {"$limit": limit * 4}
+                                ]
+                            }
+                        },
+                        "combination": {"weights": HYBRID_WEIGHTS}
+                    }
+                },
+                {"$limit": limit},
+                {
+                    "$addFields": {
+                        "search_score": {"$meta": "score"}
+                    }
+                },
+                _search_result_stage(detailed=True, fused=True)
+            ]
+            
+            cursor = await db.jobs.aggregate(pipeline)
+            formatted_results = await cursor.to_list(length=limit)
+            
+            logger.info("Hybrid search found %d results for query: %r", len(formatted_results), query)
+            
+            return {
+                "query": query,
+                "hybrid": True,
+                "total_results": len(formatted_results),
+                "results": formatted_results
+            }
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Hybrid search unavailable, using semantic search: {str(e)}")
+            return await self.semantic_job_search(
+                query, limit,
+                num_candidates=num_candidates,
+                candidates_multiplier=candidates_multiplier
+            )
+    
     async def search_jobs_for_student(
         self,
         student_id: str,
         query: str,
-        limit: int = 50
+        limit: int = 50,
+        num_candidates: Optional[int] = None,
+        candidates_multiplier: int = NUM_CANDIDATES_MULTIPLIER
     ) -> Dict:
         """
         Personalized semantic search using student profile + query
         Combines student profile embedding with query for better results
+        
+        num_candidates / candidates_multiplier size the ANN candidate pool
+        as in semantic_job_search
         """
         try:
-            db = self._get_db()
+            db = self._get_async_db()
             
-            # Get student profile
-            student = db.users.find_one({"_id": ObjectId(student_id)})
+            # Get student profile and embed the raw query concurrently
+            student, raw_embedding = await asyncio.gather(
+                db.users.find_one(
+                    {"_id": ObjectId(student_id)},
+                    {"profile_data.technical_skills": 1, "profile_data.branch": 1}
+                ),
+                self._embed_query(query)
+            )
             
             if not student or not student.get('profile_data'):
-                # Fall back to regular search
-                return await self.semantic_job_search(query, limit)
+                # Fall back to regular search (raw query embedding is cached)
+                return await self.semantic_job_search(
+                    query, limit,
+                    num_candidates=num_candidates,
+                    candidates_multiplier=candidates_multiplier
+                )
             
             profile_data = student.get('profile_data', {})
             
             # Enhance query with student context
-            enhanced_query = f"{query} {profile_data.get('technical_skills', '')} {profile_data.get('branch', '')}"
+            context = f"{profile_data.get('technical_skills') or ''} {profile_data.get('branch') or ''}".strip()
             
-            # Generate embedding for enhanced query
-            query_data = {
-                "description": enhanced_query,
-                "title": query,
-                "skills": profile_data.get('technical_skills', '')
-            }
-
-            query_embedding = await embedding_service.generate_text_embedding(query_data)
+            # Only re-embed when the profile actually adds something
+            if context:
+                query_embedding = await self._embed_query(f"{query} {context}")
+            else:
+                query_embedding = raw_embedding
             
             # MongoDB Vector Search
             pipeline = [
@@ -177,8 +508,11 @@ class SearchService:
                         "index": self.vector_index_name,
                         "path": "job_embedding",
                         "queryVector": query_embedding,
-                        "numCandidates": limit * 4,
-                        "limit": limit
+                        "numCandidates": _num_candidates(limit, num_candidates, candidates_multiplier),
+                        "limit": limit,
+                        # Pre-filter inside the ANN walk so inactive jobs
+                        # don't use up candidate slots
+                        "filter": {"is_active": True, "status": "active"}
                     }
                 },
                 {
@@ -186,49 +520,12 @@ class SearchService:
                         "search_score": {"$meta": "vectorSearchScore"}
                     }
                 },
-                {
-                    "$match": {
-                        "is_active": True,
-                        "status": "active"
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 1,
-                        "title": 1,
-                        "company": 1,
-                        "location": 1,
-                        "description": 1,
-                        "skills_required": 1,
-                        "job_type": 1,
-                        "experience_required": 1,
-                        "salary_range": 1,
-                        "posted_at": 1,
-                        "source": 1,
-                        "job_url": 1,
-                        "search_score": 1
-                    }
-                }
+                _search_result_stage(detailed=False)
             ]
             
-            results = list(db.jobs.aggregate(pipeline))
-            
-            # Format results
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id": str(result["_id"]),
-                    "title": result["title"],
-                    "company": result["company"],
-                    "location": result["location"],
-                    "description": result.get("description", "")[:300] + "...",
-                    "skills_required": result.get("skills_required", ""),
-                    "job_type": result["job_type"],
-                    "salary_range": result.get("salary_range", ""),
-                    "posted_at": result["posted_at"],
-                    "source": result.get("source", "unknown"),
-                    "match_score": int(result["search_score"] * 100)
-                })
+            # Results come back already formatted by the $project stage
+            cursor = await db.jobs.aggregate(pipeline)
+            formatted_results = await cursor.to_list(length=limit)
             
             return {
                 "query": query,
@@ -240,97 +537,134 @@ class SearchService:
         except Exception as e:
             logger.error(f"Error in personalized search: {str(e)}")
             # Fall back to regular search
-            return await self.semantic_job_search(query, limit)
+            return await self.semantic_job_search(
+                query, limit,
+                num_candidates=num_candidates,
+                candidates_multiplier=candidates_multiplier
+            )
     
-    def get_jobs_by_domain(
+    async def get_jobs_by_domain(
         self,
         branch: str,
         limit: int = 100,
-        page: int = 1
+        page: int = 1,
+        cursor: Optional[str] = None
     ) -> Dict:
         """
         Get all jobs in a specific domain/branch
         Simple filter - no embeddings needed
         
+        Pages by offset (``page``) or, when a ``cursor`` from a previous
+        response's ``next_cursor`` is passed, by seeking past the last job
+        seen on (posted_at, _id) - constant cost however deep the page. The
+        cursor path skips the total count.
+        
         Args:
             branch: Student's branch (e.g., "Computer Science", "Electronics")
             limit: Results per page
-            page: Page number
+            page: Page number, ignored when cursor is given
+            cursor: Keyset cursor returned as next_cursor
         """
         try:
-            db = self._get_db()
-            
-            # Branch to keywords mapping
-            branch_keywords = {
-                'computer': ['software', 'developer', 'programmer', 'coding', 'web', 'app', 'data', 'ai', 'ml', 'tech'],
-                'electronics': ['hardware', 'embedded', 'circuit', 'electronics', 'iot', 'robotics'],
-                'mechanical': ['manufacturing', 'design', 'cad', 'mechanical', 'automotive', 'production'],
-                'electrical': ['electrical', 'power', 'energy', 'automation', 'control'],
-                'civil': ['civil', 'construction', 'structure', 'building', 'infrastructure'],
-                'chemical': ['chemical', 'process', 'plant', 'pharma', 'refinery']
-            }
-            
-            # Find matching keywords
-            keywords = []
-            branch_lower = branch.lower()
-            
-            for key, kw_list in branch_keywords.items():
-                if key in branch_lower:
-                    keywords = kw_list
-                    break
-            
-            if not keywords:
-                keywords = [branch_lower]
-            
-            # Build regex pattern
-            regex_pattern = '|'.join(keywords)
+            keyset = None
+            if cursor:
+                try:
+                    keyset = _decode_domain_cursor(cursor)
+                except ValueError as e:
+                    return {"error": str(e), "branch": branch, "total_jobs": 0, "jobs": []}
+            
+            db = self._get_async_db()
+            
+            # Find the branch's domain, its keywords and regex pattern
+            domain, keywords, regex_pattern = _resolve_branch(branch.lower())
+            
+            regex_match = [
+                {"title": {"$regex": regex_pattern, "$options": "i"}},
+                {"description": {"$regex": regex_pattern, "$options": "i"}},
+                {"skills_required": {"$regex": regex_pattern, "$options": "i"}}
+            ]
             
             # Query with pagination
             skip = (page - 1) * limit
             
-            jobs = list(db.jobs.find({
-                "is_active": True,
-                "status": "active",
-                "$or": [
-                    {"title": {"$regex": regex_pattern, "$options": "i"}},
-                    {"description": {"$regex": regex_pattern, "$options": "i"}},
-                    {"skills_required": {"$regex": regex_pattern, "$options": "i"}}
-                ]
-            }).sort("posted_at", -1).skip(skip).limit(limit))
-            
-            # Count total
-            total = db.jobs.count_documents({
-                "is_active": True,
-                "status": "active",
-                "$or": [
-                    {"title": {"$regex": regex_pattern, "$options": "i"}},
-                    {"description": {"$regex": regex_pattern, "$options": "i"}},
-                    {"skills_required": {"$regex": regex_pattern, "$options": "i"}}
+            if domain:
+                # Known domain: indexed lookup on the tags computed at write
+                # time; the regex only runs on jobs written before tagging
+                match = {
+                    "is_active": True,
+                    "status": "active",
+                    "$or": [
+                        {"domain_tags": domain},
+                        {"domain_tags": {"$exists": False}, "$or": regex_match}
+                    ]
+                }
+            else:
+                match = {
+                    "is_active": True,
+                    "status": "active",
+                    "$or": regex_match
+                }
+            
+            # Only what's returned (no job_embedding / raw payloads); the
+            # description is cut down in Mongo so the full text never ships
+            projection = {
+                "$project": {
+                    "title": 1,
+                    "company": 1,
+                    "location": 1,
+                    "description": {"$concat": [{"$substrCP": [{"$ifNull": ["$description", ""]}, 0, 300]}, "..."]},
+                    "job_type": 1,
+                    "salary_range": 1,
+                    "posted_at": 1,
+                    "source": 1
+                }
+            }
+            sort = {"$sort": {"posted_at": -1, "_id": -1}}
+            
+            if keyset:
+                last_posted_at, last_id = keyset
+                match = {"$and": [match, {"$or": [
+                    {"posted_at": {"$lt": last_posted_at}},
+                    {"posted_at": last_posted_at, "_id": {"$lt": last_id}}
+                ]}]}
+                
+                # One extra row tells us whether another page exists
+                pipeline = [{"$match": match}, sort, {"$limit": limit + 1}, projection]
+                results = await db.jobs.aggregate(pipeline)
+                jobs = await results.to_list()
+                
+                has_next = len(jobs) > limit
+                jobs = jobs[:limit]
+                total = None
+            else:
+                # Page + total from one evaluation of the filter
+                pipeline = [
+                    {"$match": match},
+                    {"$facet": {
+                        "data": [sort, {"$skip": skip}, {"$limit": limit}, projection],
+                        "total": [{"$count": "n"}]
+                    }}
                 ]
-            })
+                results = await db.jobs.aggregate(pipeline)
+                result = next(iter(await results.to_list()), {})
+                
+                jobs = result.get("data", [])
+                total = (result.get("total") or [{}])[0].get("n", 0)
+                has_next = skip + len(jobs) < total
+            
+            next_cursor = _encode_domain_cursor(jobs[-1]) if has_next and jobs else None
             
             # Format results
-            formatted_jobs = []
-            for job in jobs:
-                formatted_jobs.append({
-                    "id": str(job["_id"]),
-                    "title": job["title"],
-                    "company": job["company"],
-                    "location": job["location"],
-                    "description": job.get("description", "")[:300] + "...",
-                    "job_type": job["job_type"],
-                    "salary_range": job.get("salary_range", ""),
-                    "posted_at": job["posted_at"],
-                    "source": job.get("source", "unknown")
-                })
+            formatted_jobs = [_format_domain_job(job) for job in jobs]
             
             return {
                 "branch": branch,
-                "keywords_used": keywords,
+                "keywords_used": list(keywords),
                 "total_jobs": total,
-                "page": page,
+                "page": None if keyset else page,
                 "limit": limit,
-                "total_pages": (total + limit - 1) // limit,
+                "total_pages": None if keyset else (total + limit - 1) // limit,
+                "next_cursor": next_cursor,
                 "jobs": formatted_jobs
             }
         
@@ -343,52 +677,145 @@ class SearchService:
                 "jobs": []
             }
     
+    async def get_jobs_by_domains(
+        self,
+        branches: List[str],
+        limit: int = 100,
+        page: int = 1
+    ) -> List[Dict]:
+        """
+        Get jobs for several branches at once (e.g. a student with dual interests)
+        
+        Branches that resolve to the same domain share one query, and the
+        distinct queries run concurrently.
+        
+        Returns:
+            One get_jobs_by_domain result per input branch, in input order
+        """
+        queries: Dict[Tuple, str] = {}
+        for branch in branches:
+            queries.setdefault(_resolve_branch(branch.lower()), branch)
+        
+        results = await asyncio.gather(
+            *(self.get_jobs_by_domain(branch, limit, page) for branch in queries.values())
+        )
+        by_key = dict(zip(queries, results))
+        
+        return [
+            {**by_key[_resolve_branch(branch.lower())], "branch": branch}
+            for branch in branches
+        ]
+    
+    async def combined_search(
+        self,
+        student_id: str,
+        query: str,
+        branch: str,
+        limit: int = 50
+    ) -> Dict:
+        """
+        Personalized semantic matches and branch domain jobs for one student
+        
+        Both lookups run concurrently, so the caller waits only for the
+        slower one (normally the embedding + $vectorSearch side).
+        
+        Returns:
+            {"semantic": <search_jobs_for_student result>, "domain": <get_jobs_by_domain result>}
+        """
+        semantic, domain = await asyncio.gather(
+            self.search_jobs_for_student(student_id, query, limit),
+            self.get_jobs_by_domain(branch, limit),
+            return_exceptions=True
+        )
+        
+        # One side failing shouldn't hide the other's results
+        if isinstance(semantic, Exception):
+            logger.error(f"Error in combined search (semantic): {str(semantic)}")
+            semantic = {"error": str(semantic), "query": query, "total_results": 0, "results": []}
+        if isinstance(domain, Exception):
+            logger.error(f"Error in combined search (domain): {str(domain)}")
+            domain = {"error": str(domain), "branch": branch, "total_jobs": 0, "jobs": []}
+        
+        return {"semantic": semantic, "domain": domain}
+    
+    async def ensure_text_index(self) -> Dict:
+        """
+        Create the job full-text search index used by hybrid_job_search
+        
+        Returns:
+            {"action": "created" | "unchanged" | "error", ...}
+        """
+        try:
+            db = self._get_async_db()
+            
+            indexes = await db.jobs.list_search_indexes(JOB_TEXT_INDEX_NAME)
+            if await indexes.to_list():
+                return {"action": "unchanged"}
+            
+            await db.jobs.create_search_index(SearchIndexModel(
+                definition=JOB_TEXT_INDEX_DEFINITION,
+                name=JOB_TEXT_INDEX_NAME,
+                type="search"
+            ))
+            logger.info(f"✅ Created text search index {JOB_TEXT_INDEX_NAME}")
+            return {"action": "created"}
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Could not ensure text search index: {str(e)}")
+            return {"action": "error", "error": str(e)}
+    
     async def check_vector_index_status(self) -> Dict:
         """
         Check if MongoDB Vector Search index exists and is ready
+        
+        Reads the index state from Atlas' search index metadata rather than
+        running a probe query.
         """
+        now = time.monotonic()
+        if self._index_status is not None and now < self._index_status_expires:
+            return self._index_status
+        
         try:
-            db = self._get_db()
+            db = self._get_async_db()
             
-            # Try a test search
-            test_embedding = [0.1] * 384  # Dummy embedding
+            cursor = await db.jobs.list_search_indexes(self.vector_index_name)
+            indexes = await cursor.to_list()
             
-            result = db.jobs.aggregate([
-                {
-                    "$vectorSearch": {
-                        "index": self.vector_index_name,
-                        "path": "job_embedding",
-                        "queryVector": test_embedding,
-                        "numCandidates": 1,
-                        "limit": 1
-                    }
-                },
-                {"$limit": 1}
-            ])
-            
-            list(result)  # Execute the query
-            
-            return {
-                "status": "ready",
-                "index_name": self.vector_index_name,
-                "message": "Vector search index is ready!"
-            }
-        
-        except Exception as e:
-            error_msg = str(e)
-            
-            if "index" in error_msg.lower():
-                return {
+            if not indexes:
+                status = {
                     "status": "missing",
                     "index_name": self.vector_index_name,
                     "error": "Vector search index not found",
                     "message": "Please create the index in MongoDB Atlas"
                 }
+            elif not indexes[0].get("queryable"):
+                status = {
+                    "status": "building",
+                    "index_name": self.vector_index_name,
+                    "index_status": indexes[0].get("status"),
+                    "message": "Vector search index is being built"
+                }
             else:
-                return {
-                    "status": "error",
-                    "error": error_msg
+                # Report how the index stores vectors (scalar = int8 in the index)
+                fields = indexes[0].get("latestDefinition", {}).get("fields", [])
+                vector_field = next((f for f in fields if f.get("type") == "vector"), {})
+                status = {
+                    "status": "ready",
+                    "index_name": self.vector_index_name,
+                    "quantization": vector_field.get("quantization", "none"),
+                    "message": "Vector search index is ready!"
                 }
+            
+            ttl = INDEX_STATUS_TTL_SECONDS if status["status"] == "ready" else INDEX_STATUS_NOT_READY_TTL_SECONDS
+            self._index_status = status
+            self._index_status_expires = now + ttl
+            return status
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": str(e)
+            }
 
 
 # Singleton instance
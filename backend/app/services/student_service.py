@@ -11,10 +11,58 @@ Handles student profile CRUD operations including:
 - Date string to datetime object conversion (MongoDB compatible)
 """
 
+import asyncio
+import logging
 from bson import ObjectId
+from bson.binary import Binary
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List
-from app.db.mongo import get_database
+from pymongo import ReturnDocument, UpdateOne
+from app.db.mongo import get_async_database
+from app.services.recommendation_service import invalidate_student_embedding
+
+logger = logging.getLogger(__name__)
+
+# Array edits wait this long for follow-up edits before re-embedding, so a
+# burst of changes costs one embedding pass
+EMBEDDING_DEBOUNCE_SECONDS = 2.0
+
+# Background embedding queue: profiles arriving within this window of each
+# other are embedded in one model call
+EMBEDDING_BATCH_WINDOW_SECONDS = 0.05
+EMBEDDING_BATCH_MAX = 32
+
+# Profile arrays (education, experience, projects, ...) keep at most this
+# many entries; adding past it drops the oldest
+PROFILE_ARRAY_MAX_ITEMS = 50
+
+# Profile array fields the array methods may touch -> their document path;
+# anything else is rejected before it reaches a Mongo field path
+ALLOWED_ARRAY_FIELDS = {
+    field: f"profile_data.{field}"
+    for field in ("education", "experience", "projects", "skills", "certifications")
+}
+
+
+def _embedding_pending_fields(requested_at: datetime) -> Dict[str, Any]:
+    """$set fields marking a profile's embedding as queued (cleared once it's written)"""
+    return {
+        "embedding_pending": True,
+        "embedding_requested_at": requested_at,
+        "embedding_error": None
+    }
+
+
+def _parse_iso_date(value: str) -> Optional[datetime]:
+    """Parse a 'YYYY-MM-DD' date string to a datetime at midnight (None if invalid)"""
+    try:
+        # C-implemented fast path; handles the ISO dates the forms send
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d')
+        except Exception:
+            return None
 
 
 def prepare_profile_data_for_storage(profile_data: dict) -> dict:
@@ -22,18 +70,17 @@ def prepare_profile_data_for_storage(profile_data: dict) -> dict:
     Prepare profile data for MongoDB storage by converting date strings to datetime objects
     MongoDB can store datetime but not date objects, so we convert date -> datetime
     """
-    import copy
-    data = copy.deepcopy(profile_data)
+    # Only top-level date_of_birth and preferences.availability_date change,
+    # so copy just those two levels (nested lists are shared, not rewritten)
+    data = {**profile_data}
+    if isinstance(data.get('preferences'), dict):
+        data['preferences'] = {**data['preferences']}
     
     # Convert date_of_birth string to datetime (MongoDB compatible)
     if data.get('date_of_birth'):
         if isinstance(data['date_of_birth'], str):
-            try:
-                # Parse string date and convert to datetime at midnight
-                parsed_date = datetime.strptime(data['date_of_birth'], '%Y-%m-%d')
-                data['date_of_birth'] = parsed_date  # Store as datetime
-            except Exception as e:                
-                data['date_of_birth'] = None
+            # Parse string date and convert to datetime at midnight
+            data['date_of_birth'] = _parse_iso_date(data['date_of_birth'])  # Store as datetime
         elif isinstance(data['date_of_birth'], date):
             # Convert date object to datetime
             data['date_of_birth'] = datetime.combine(data['date_of_birth'], datetime.min.time())
@@ -42,11 +89,9 @@ def prepare_profile_data_for_storage(profile_data: dict) -> dict:
     if 'preferences' in data and isinstance(data['preferences'], dict):
         if data['preferences'].get('availability_date'):
             if isinstance(data['preferences']['availability_date'], str):
-                try:
-                    parsed_date = datetime.strptime(data['preferences']['availability_date'], '%Y-%m-%d')
-                    data['preferences']['availability_date'] = parsed_date  # Store as datetime
-                except Exception as e:                    
-                    data['preferences']['availability_date'] = None
+                data['preferences']['availability_date'] = _parse_iso_date(
+                    data['preferences']['availability_date']
+                )  # Store as datetime
             elif isinstance(data['preferences']['availability_date'], date):
                 # Convert date object to datetime
                 data['preferences']['availability_date'] = datetime.combine(
@@ -57,12 +102,87 @@ def prepare_profile_data_for_storage(profile_data: dict) -> dict:
     return data
 
 
+def _array_path(field_name: str) -> str:
+    """Document path for a whitelisted profile array field"""
+    array_path = ALLOWED_ARRAY_FIELDS.get(field_name)
+    if array_path is None:
+        raise ValueError(f"Unknown profile field: {field_name}")
+    return array_path
+
+
+def _join_entries(entries: Any, fmt) -> str:
+    """Format each dict entry of a profile array and join them ("" if none)"""
+    if not isinstance(entries, list):
+        return ""
+    parts = [fmt(entry) for entry in entries if isinstance(entry, dict)]
+    return "; ".join(part for part in parts if part)
+
+
+def _flatten_profile_for_embedding(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten the nested profile (education/skills/experience/projects/
+    certifications arrays, preferences) into the flat text fields the
+    embedding text template reads
+    
+    Each field is built once with join rather than grown piecewise. Fields
+    already stored flat (older profiles) are left as they are.
+    """
+    flat = {**profile_data}
+    education = profile_data.get("education")
+    skills = profile_data.get("skills")
+    preferences = profile_data.get("preferences")
+    preferences = preferences if isinstance(preferences, dict) else {}
+    
+    derived = {
+        "branch": _join_entries(education, lambda e: e.get("branch") or ""),
+        "degree": _join_entries(education, lambda e: e.get("degree") or ""),
+        "technical_skills": ", ".join(
+            skill["name"] for skill in skills or []
+            if isinstance(skill, dict) and skill.get("name") and "soft" not in (skill.get("category") or "").lower()
+        ),
+        "soft_skills": ", ".join(
+            skill["name"] for skill in skills or []
+            if isinstance(skill, dict) and skill.get("name") and "soft" in (skill.get("category") or "").lower()
+        ),
+        "experience": _join_entries(
+            profile_data.get("experience"),
+            lambda e: f"{e.get('role', '')} at {e.get('company', '')}: {e.get('description', '')}"
+        ),
+        "projects": _join_entries(
+            profile_data.get("projects"),
+            lambda p: f"{p.get('title', '')} ({', '.join(p.get('tech_stack') or [])}): {p.get('description', '')}"
+        ),
+        "certifications": _join_entries(
+            profile_data.get("certifications"),
+            lambda c: f"{c.get('name', '')} ({c.get('issuer', '')})"
+        ),
+        "preferred_roles": preferences.get("preferred_roles") or "",
+        "preferred_industries": preferences.get("preferred_industries") or "",
+    }
+    
+    for key, value in derived.items():
+        if not isinstance(flat.get(key), str):
+            flat[key] = value
+    
+    return flat
+
+
 class StudentService:
     """Service layer for student-related operations"""
     
+    def __init__(self):
+        # Pending debounced embedding regenerations, per user
+        self._embedding_timers: Dict[str, asyncio.TimerHandle] = {}
+        # Strong refs so running regeneration tasks aren't garbage collected
+        self._embedding_tasks: set = set()
+        # Background embedding queue + its worker (created on first use)
+        self._embedding_queue: Optional[asyncio.Queue] = None
+        self._embedding_worker: Optional[asyncio.Task] = None
+        self._embedding_write: Optional[asyncio.Task] = None
+    
     def get_database(self):
-        """Helper to get database instance"""
-        db = get_database()
+        """Helper to get the async (non-blocking) database instance"""
+        db = get_async_database()
         if db is None:
             raise Exception("Database not connected")
         return db
@@ -70,7 +190,26 @@ class StudentService:
     async def get_student_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get student profile by user ID"""
         db = self.get_database()
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        
+        # The embedding only feeds has_embedding, so Mongo answers that
+        # instead of shipping the vector
+        cursor = await db.users.aggregate([
+            {"$match": {"_id": ObjectId(user_id)}},
+            {"$limit": 1},
+            {"$project": {
+                "email": 1,
+                "role": 1,
+                "full_name": 1,
+                "profile_picture": 1,
+                "profile_completed": 1,
+                "profile_data": 1,
+                "embedding_generated_at": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "has_embedding": {"$ne": [{"$ifNull": ["$profile_embedding", None]}, None]}
+            }}
+        ])
+        user = next(iter(await cursor.to_list()), None)
         
         if not user:
             return None
@@ -83,19 +222,65 @@ class StudentService:
             "profile_picture": user.get("profile_picture"),
             "profile_completed": user.get("profile_completed", False),
             "profile_data": user.get("profile_data"),
-            "has_embedding": user.get("profile_embedding") is not None,
+            "has_embedding": user["has_embedding"],
             "embedding_generated_at": user.get("embedding_generated_at"),
             "created_at": user["created_at"],
             "updated_at": user["updated_at"]
         }
     
+    async def get_embedding_status(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Embedding presence and dimension, computed without fetching the vector"""
+        from app.services.embedding_service import FLOAT32_VECTOR_HEADER_SIZE
+        
+        db = self.get_database()
+        
+        # Packed float32 vectors are the driver's header followed by 4-byte
+        # elements; legacy profiles may still hold plain arrays
+        embedding = "$profile_embedding"
+        cursor = await db.users.aggregate([
+            {"$match": {"_id": ObjectId(user_id)}},
+            {"$limit": 1},
+            {"$project": {
+                "embedding_generated_at": 1,
+                "embedding_model": 1,
+                "embedding_pending": 1,
+                "embedding_error": 1,
+                "has_embedding": {"$ne": [{"$ifNull": [embedding, None]}, None]},
+                "embedding_dimension": {"$switch": {
+                    "branches": [
+                        {"case": {"$isArray": embedding}, "then": {"$size": embedding}},
+                        {"case": {"$eq": [{"$type": embedding}, "binData"]},
+                         "then": {"$toInt": {"$divide": [{"$subtract": [{"$binarySize": embedding}, FLOAT32_VECTOR_HEADER_SIZE]}, 4]}}}
+                    ],
+                    "default": 0
+                }}
+            }}
+        ])
+        user = next(iter(await cursor.to_list()), None)
+        
+        if not user:
+            return None
+        
+        return {
+            "has_embedding": user["has_embedding"],
+            "embedding_generated_at": user.get("embedding_generated_at"),
+            "embedding_model": user.get("embedding_model"),
+            "embedding_dimension": user["embedding_dimension"],
+            "embedding_pending": user.get("embedding_pending", False),
+            "embedding_error": user.get("embedding_error"),
+            "can_get_recommendations": user["has_embedding"]
+        }
+    
     async def complete_student_profile(
         self, 
         user_id: str, 
         profile_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """
-        Complete student profile and generate embedding
+        Complete student profile and queue its embedding
+        
+        The embedding is generated in the background (batched with other
+        profiles), so the response only waits for the profile write.
         
         Args:
             user_id: User ID
@@ -106,56 +291,48 @@ class StudentService:
         """
         db = self.get_database()
         
-        print("🔧 Preparing data for storage...")
+        logger.debug("🔧 Preparing data for storage...")
         # Prepare data for storage (convert dates to datetime for MongoDB)
         prepared_data = prepare_profile_data_for_storage(profile_data)
-        print("✅ Data prepared successfully")
+        logger.debug("✅ Data prepared successfully")
         
-        print("💾 Updating MongoDB...")
-        # Update user profile
-        result = db.users.update_one(
+        logger.debug("💾 Updating MongoDB...")
+        # Update user profile; the pending flag lets a restart pick the
+        # embedding back up if the queue is lost
+        now = datetime.utcnow()
+        result = await db.users.update_one(
             {"_id": ObjectId(user_id)},
             {
                 "$set": {
                     "profile_data": prepared_data,
                     "profile_completed": True,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": now,
+                    **_embedding_pending_fields(now)
                 }
             }
         )
         
-        if result.modified_count == 0:
-            raise ValueError("User not found or profile not updated")
-        
-        print("✅ Profile saved to MongoDB")
+        # matched, not modified: re-saving an unchanged profile is fine
+        if result.matched_count == 0:
+            raise ValueError("User not found")
         
-        # ============ GENERATE EMBEDDING ============
-        from app.services.embedding_service import embedding_service
+        logger.debug("✅ Profile saved to MongoDB")
         
-        embedding_generated = False
-        embedding_error = None
+        # Scheduled scrapes derive search terms from profiles
+        from app.services.job_scheduler import invalidate_search_terms
+        invalidate_search_terms()
         
-        try:
-            print("🧠 Generating profile embedding...")
-            # Generate embedding from profile data
-            embedding = await embedding_service.generate_profile_embedding(profile_data)
-            
-            # Store embedding in database
-            await self.update_profile_embedding(user_id, embedding, embedding_service.model_name)
-            
-            embedding_generated = True
-            print("✅ Embedding generated successfully")
-        except Exception as e:
-            # Log the error but don't fail the profile creation
-            embedding_error = str(e)
-            print(f"⚠️ Warning: Failed to generate embedding: {embedding_error}")
+        # ============ GENERATE EMBEDDING ============
+        logger.debug("🧠 Queueing profile embedding...")
+        self._enqueue_embedding(user_id, profile_data, now)
         # ============================================
         
         return {
             "message": "Profile completed successfully",
             "profile_completed": True,
-            "embedding_generated": embedding_generated,
-            "embedding_error": embedding_error if not embedding_generated else None
+            "embedding_generated": False,
+            "embedding_pending": True,
+            "embedding_error": None
         }
     
     async def update_student_profile(
@@ -164,7 +341,7 @@ class StudentService:
         profile_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """
-        Update student profile and regenerate embedding
+        Update student profile and queue its embedding regeneration
         
         Args:
             user_id: User ID
@@ -178,45 +355,242 @@ class StudentService:
         # Prepare data for storage (convert dates to datetime for MongoDB)
         prepared_data = prepare_profile_data_for_storage(profile_data)
         
-        # Update profile data
-        result = db.users.update_one(
+        # Update profile data (and mark its embedding pending)
+        now = datetime.utcnow()
+        result = await db.users.update_one(
             {"_id": ObjectId(user_id)},
             {
                 "$set": {
                     "profile_data": prepared_data,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": now,
+                    **_embedding_pending_fields(now)
                 }
             }
         )
         
-        if result.modified_count == 0:
-            raise ValueError("User not found or profile not updated")
+        # matched, not modified: re-saving an unchanged profile is fine
+        if result.matched_count == 0:
+            raise ValueError("User not found")
+        
+        # Scheduled scrapes derive search terms from profiles
+        from app.services.job_scheduler import invalidate_search_terms
+        invalidate_search_terms()
         
         # ============ REGENERATE EMBEDDING ============
+        self._enqueue_embedding(user_id, profile_data, now)
+        # ==============================================
+        
+        return {
+            "message": "Profile updated successfully",
+            "embedding_updated": False,
+            "embedding_pending": True,
+            "embedding_error": None
+        }
+    
+    # ============================================
+    # BACKGROUND EMBEDDING QUEUE
+    # ============================================
+    
+    def _enqueue_embedding(
+        self,
+        user_id: str,
+        profile_data: Dict[str, Any],
+        requested_at: Optional[datetime]
+    ) -> None:
+        """
+        Queue a profile for background (batched) embedding generation
+        
+        requested_at is the embedding_requested_at written with the
+        profile; the pending flag is only settled if it still matches.
+        """
+        profile_data = _flatten_profile_for_embedding(profile_data)
+        
+        if self._embedding_queue is None:
+            # Created on first use so they belong to the running event loop
+            self._embedding_queue = asyncio.Queue()
+            self._embedding_worker = asyncio.ensure_future(self._run_embedding_worker())
+        
+        self._embedding_queue.put_nowait((user_id, profile_data, requested_at))
+    
+    async def _run_embedding_worker(self):
+        """
+        Consume the embedding queue in micro-batches
+        
+        Waits up to EMBEDDING_BATCH_WINDOW_SECONDS after the first queued
+        profile for more to arrive, then embeds the batch in one model call
+        and writes all vectors in one bulk_write (in the background, while
+        the next batch is collected and embedded). A failed model pass is
+        recorded as the users' embedding_error.
+        """
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            user_id, profile_data, requested_at = await self._embedding_queue.get()
+            # Latest profile wins if a user was queued twice in one window
+            batch = {user_id: (profile_data, requested_at)}
+            
+            deadline = loop.time() + EMBEDDING_BATCH_WINDOW_SECONDS
+            while len(batch) < EMBEDDING_BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    user_id, profile_data, requested_at = await asyncio.wait_for(self._embedding_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch[user_id] = (profile_data, requested_at)
+            
+            requested = {user_id: requested_at for user_id, (_, requested_at) in batch.items()}
+            try:
+                embeddings = await self._embed_profiles_batch(
+                    {user_id: profile_data for user_id, (profile_data, _) in batch.items()}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to generate {len(batch)} profile embeddings: {e}")
+                self._embedding_write = asyncio.ensure_future(self._mark_embeddings_failed(
+                    requested, f"Embedding generation failed: {e}", self._embedding_write
+                ))
+                continue
+            
+            # Write in the background so the next batch's model pass overlaps
+            # this batch's round trip; writes stay in batch order
+            self._embedding_write = asyncio.ensure_future(
+                self._write_embeddings_batch(requested, embeddings, self._embedding_write)
+            )
+    
+    async def _embed_profiles_batch(self, profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Binary]:
+        """Embed a batch of profiles in one model call (user_id -> embedding)"""
+        from app.services.embedding_service import embedding_service
+        
+        embeddings = await embedding_service.generate_profile_embeddings_batch(list(profiles.values()))
+        return dict(zip(profiles, embeddings))
+    
+    async def _write_embeddings_batch(
+        self,
+        requested: Dict[str, Optional[datetime]],
+        embeddings: Dict[str, Binary],
+        previous: Optional[asyncio.Task] = None
+    ):
+        """
+        Write a batch of embeddings in one bulk_write, after the previous
+        batch's write, and settle the users' pending flags
+        
+        requested maps user_id -> the embedding_requested_at it was queued
+        with; a user saved again since stays pending for the newer profile.
+        """
         from app.services.embedding_service import embedding_service
         
-        embedding_generated = False
-        embedding_error = None
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
         
         try:
-            # Regenerate embedding from updated profile data
-            embedding = await embedding_service.generate_profile_embedding(profile_data)
+            now = datetime.utcnow()
+            operations = []
+            for user_id, embedding in embeddings.items():
+                oid = ObjectId(user_id)
+                operations.append(UpdateOne(
+                    {"_id": oid},
+                    {
+                        "$set": {
+                            "profile_embedding": embedding,
+                            "embedding_generated_at": now,
+                            "embedding_model": embedding_service.model_name
+                        }
+                    }
+                ))
+                operations.append(UpdateOne(
+                    {"_id": oid, "embedding_requested_at": requested[user_id]},
+                    {"$set": {"embedding_pending": False, "embedding_error": None}}
+                ))
+            await self.get_database().users.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to store {len(embeddings)} profile embeddings: {e}")
+            await self._mark_embeddings_failed(requested, f"Storing embedding failed: {e}")
+            return
+        
+        # Recommendations cache the embedding; make them see the new one
+        for user_id in embeddings:
+            invalidate_student_embedding(user_id)
+    
+    async def _mark_embeddings_failed(
+        self,
+        requested: Dict[str, Optional[datetime]],
+        error: str,
+        previous: Optional[asyncio.Task] = None
+    ):
+        """
+        Record a failed batch as the users' embedding_error
+        
+        If even that write fails the users stay pending, so the next
+        startup retries them.
+        """
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        
+        try:
+            await self.get_database().users.bulk_write([
+                UpdateOne(
+                    {"_id": ObjectId(user_id), "embedding_requested_at": requested_at},
+                    {"$set": {"embedding_pending": False, "embedding_error": error}}
+                )
+                for user_id, requested_at in requested.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to record embedding error for {len(requested)} profiles: {e}")
+    
+    async def resume_pending_embeddings(self) -> int:
+        """
+        Re-queue profiles whose embedding was still pending when the last
+        process stopped
+        
+        Returns:
+            Number of profiles queued
+        """
+        try:
+            db = self.get_database()
             
-            # Update embedding in database
-            await self.update_profile_embedding(user_id, embedding, embedding_service.model_name)
+            resumed = 0
+            async for user in db.users.find(
+                {"embedding_pending": True},
+                {"profile_data": 1, "embedding_requested_at": 1}
+            ):
+                if user.get("profile_data"):
+                    self._enqueue_embedding(str(user["_id"]), user["profile_data"], user.get("embedding_requested_at"))
+                    resumed += 1
             
-            embedding_generated = True
+            if resumed:
+                logger.info(f"🧠 Re-queued {resumed} pending profile embeddings")
+            
+            return resumed
+        
         except Exception as e:
-            # Log the error but don't fail the profile update
-            embedding_error = str(e)
-            print(f"Warning: Failed to regenerate embedding: {embedding_error}")
-        # ==============================================
+            logger.error(f"❌ Error resuming pending embeddings: {str(e)}")
+            return 0
+    
+    async def shutdown(self):
+        """
+        Stop background embedding work before the database is closed
         
-        return {
-            "message": "Profile updated successfully",
-            "embedding_updated": embedding_generated,
-            "embedding_error": embedding_error if not embedding_generated else None
-        }
+        Debounce timers and queued profiles are dropped: their users keep
+        embedding_pending, so resume_pending_embeddings re-queues them on
+        the next start. A write already in flight is allowed to finish.
+        """
+        for timer in self._embedding_timers.values():
+            timer.cancel()
+        self._embedding_timers.clear()
+        
+        tasks = list(self._embedding_tasks)
+        if self._embedding_worker is not None:
+            tasks.append(self._embedding_worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._embedding_queue = None
+        self._embedding_worker = None
+        
+        if self._embedding_write is not None:
+            await asyncio.gather(self._embedding_write, return_exceptions=True)
+            self._embedding_write = None
     
     # ============================================
     # NEW: ARRAY MANAGEMENT METHODS
@@ -242,21 +616,25 @@ class StudentService:
         db = self.get_database()
         
         # Build the field path
-        array_path = f"profile_data.{field_name}"
+        array_path = _array_path(field_name)
         
-        result = db.users.update_one(
+        # Write and read back the updated profile in one round trip
+        now = datetime.utcnow()
+        user = await db.users.find_one_and_update(
             {"_id": ObjectId(user_id)},
             {
-                "$push": {array_path: item},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+                "$push": {array_path: {"$each": [item], "$slice": -PROFILE_ARRAY_MAX_ITEMS}},
+                "$set": {"updated_at": now, **_embedding_pending_fields(now)}
+            },
+            projection={"profile_data": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if user is None:
             raise ValueError("User not found or item not added")
         
-        # Regenerate embedding after update
-        await self._regenerate_embedding_after_update(user_id)
+        # Regenerate embedding once edits settle (in the background)
+        self._schedule_embedding_regeneration(user_id, now, user.get("profile_data"))
         
         return {
             "message": f"{field_name.capitalize()} added successfully",
@@ -284,37 +662,31 @@ class StudentService:
         """
         db = self.get_database()
         
-        # Get current profile
-        user = db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise ValueError("User not found")
-        
-        profile_data = user.get("profile_data", {})
-        array_data = profile_data.get(field_name, [])
-        
-        if index < 0 or index >= len(array_data):
+        if index < 0:
             raise ValueError(f"Invalid index {index} for {field_name}")
         
-        # Update the specific item
-        array_data[index] = updated_item
-        profile_data[field_name] = array_data
-        
-        # Save updated profile
-        result = db.users.update_one(
-            {"_id": ObjectId(user_id)},
+        # Replace just that element, in place; the filter only matches when
+        # the index exists, so no read is needed to bounds-check it
+        item_path = f"{_array_path(field_name)}.{index}"
+        now = datetime.utcnow()
+        user = await db.users.find_one_and_update(
+            {"_id": ObjectId(user_id), item_path: {"$exists": True}},
             {
                 "$set": {
-                    "profile_data": profile_data,
-                    "updated_at": datetime.utcnow()
+                    item_path: updated_item,
+                    "updated_at": now,
+                    **_embedding_pending_fields(now)
                 }
-            }
+            },
+            projection={"profile_data": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
-            raise ValueError("Update failed")
+        if user is None:
+            raise ValueError(f"User not found or invalid index {index} for {field_name}")
         
-        # Regenerate embedding
-        await self._regenerate_embedding_after_update(user_id)
+        # Regenerate embedding once edits settle (in the background)
+        self._schedule_embedding_regeneration(user_id, now, user.get("profile_data"))
         
         return {
             "message": f"{field_name.capitalize()} updated successfully",
@@ -340,66 +712,103 @@ class StudentService:
         """
         db = self.get_database()
         
-        # Get current profile
-        user = db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise ValueError("User not found")
-        
-        profile_data = user.get("profile_data", {})
-        array_data = profile_data.get(field_name, [])
-        
-        if index < 0 or index >= len(array_data):
+        if index < 0:
             raise ValueError(f"Invalid index {index} for {field_name}")
         
-        # Remove the item
-        array_data.pop(index)
-        profile_data[field_name] = array_data
-        
-        # Save updated profile
-        result = db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {
-                "$set": {
-                    "profile_data": profile_data,
-                    "updated_at": datetime.utcnow()
+        # Splice the element out server-side in one atomic pipeline update
+        # (array[:index] + array[index + 1:])
+        array_path = _array_path(field_name)
+        array_ref = f"${array_path}"
+        # The filter guarantees index < size, so the tail slice count is > 0
+        kept = [{"$slice": [array_ref, index + 1, {"$size": array_ref}]}]
+        if index > 0:
+            kept.insert(0, {"$slice": [array_ref, index]})
+        
+        now = datetime.utcnow()
+        user = await db.users.find_one_and_update(
+            {"_id": ObjectId(user_id), f"{array_path}.{index}": {"$exists": True}},
+            [
+                {
+                    "$set": {
+                        array_path: {"$concatArrays": kept},
+                        "updated_at": now,
+                        **_embedding_pending_fields(now)
+                    }
                 }
-            }
+            ],
+            projection={"profile_data": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
-            raise ValueError("Delete failed")
+        if user is None:
+            raise ValueError(f"User not found or invalid index {index} for {field_name}")
         
-        # Regenerate embedding
-        await self._regenerate_embedding_after_update(user_id)
+        # Regenerate embedding once edits settle (in the background)
+        self._schedule_embedding_regeneration(user_id, now, user.get("profile_data"))
         
         return {
             "message": f"{field_name.capitalize()} deleted successfully",
             "success": True
         }
     
-    async def _regenerate_embedding_after_update(self, user_id: str):
+    def _schedule_embedding_regeneration(
+        self,
+        user_id: str,
+        requested_at: datetime,
+        profile_data: Optional[Dict[str, Any]] = None,
+        delay: float = EMBEDDING_DEBOUNCE_SECONDS
+    ) -> None:
+        """
+        Debounced background embedding regeneration
+        
+        Each call restarts the user's timer, so several quick edits lead to
+        a single regeneration ``delay`` seconds after the last one, using
+        the profile_data from that last edit.
+        """
+        timer = self._embedding_timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        
+        loop = asyncio.get_running_loop()
+        self._embedding_timers[user_id] = loop.call_later(
+            delay, self._start_embedding_regeneration, user_id, requested_at, profile_data
+        )
+    
+    def _start_embedding_regeneration(
+        self,
+        user_id: str,
+        requested_at: datetime,
+        profile_data: Optional[Dict[str, Any]]
+    ) -> None:
+        """Timer callback: run the regeneration as a task"""
+        self._embedding_timers.pop(user_id, None)
+        task = asyncio.ensure_future(self._regenerate_embedding_after_update(user_id, requested_at, profile_data))
+        self._embedding_tasks.add(task)
+        task.add_done_callback(self._embedding_tasks.discard)
+    
+    async def _regenerate_embedding_after_update(
+        self,
+        user_id: str,
+        requested_at: datetime,
+        profile_data: Optional[Dict[str, Any]] = None
+    ):
         """
         Helper to regenerate embedding after profile updates
         Silently fails to not block the update operation
+        
+        Pass the just-written profile_data to skip re-reading it.
         """
         try:
-            db = self.get_database()
-            user = db.users.find_one({"_id": ObjectId(user_id)})
+            if profile_data is None:
+                db = self.get_database()
+                user = await db.users.find_one({"_id": ObjectId(user_id)}, {"profile_data": 1})
+                profile_data = user.get("profile_data") if user else None
             
-            if user and user.get("profile_data"):
-                from app.services.embedding_service import embedding_service
-                
-                embedding = await embedding_service.generate_profile_embedding(
-                    user["profile_data"]
-                )
-                
-                await self.update_profile_embedding(
-                    user_id,
-                    embedding,
-                    embedding_service.model_name
-                )
+            if profile_data:
+                # Batched with any other pending profiles
+                self._enqueue_embedding(user_id, profile_data, requested_at)
         except Exception as e:
-            print(f"Warning: Failed to regenerate embedding: {e}")
+            logger.warning(f"⚠️ Failed to regenerate embedding: {e}")
     
     # ============================================
     # EMBEDDING METHODS (Unchanged)
@@ -408,14 +817,23 @@ class StudentService:
     async def update_profile_embedding(
         self, 
         user_id: str, 
-        embedding: list,
+        embedding: Binary,
         model_name: str = "all-MiniLM-L6-v2"
     ) -> bool:
         """Update user's profile embedding"""
+        return await self._update_profile_embedding_oid(ObjectId(user_id), embedding, model_name)
+    
+    async def _update_profile_embedding_oid(
+        self,
+        oid: ObjectId,
+        embedding: Binary,
+        model_name: str = "all-MiniLM-L6-v2"
+    ) -> bool:
+        """update_profile_embedding for an already-parsed user ObjectId"""
         db = self.get_database()
         
-        result = db.users.update_one(
-            {"_id": ObjectId(user_id)},
+        result = await db.users.update_one(
+            {"_id": oid},
             {
                 "$set": {
                     "profile_embedding": embedding,
@@ -425,13 +843,20 @@ class StudentService:
             }
         )
         
-        return result.modified_count > 0
+        # Recommendations cache the embedding; make them see the new one
+        invalidate_student_embedding(str(oid))
+        
+        return result.matched_count > 0
     
     async def regenerate_profile_embedding(self, user_id: str) -> Dict[str, Any]:
         """Manually regenerate profile embedding for a user"""
         db = self.get_database()
+        oid = ObjectId(user_id)
         
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await db.users.find_one(
+            {"_id": oid},
+            {"profile_completed": 1, "profile_data": 1}
+        )
         
         if not user:
             raise ValueError("User not found")
@@ -444,9 +869,11 @@ class StudentService:
         from app.services.embedding_service import embedding_service
         
         try:
-            embedding = await embedding_service.generate_profile_embedding(profile_data)
+            embedding = await embedding_service.generate_profile_embedding(
+                _flatten_profile_for_embedding(profile_data)
+            )
             
-            success = await self.update_profile_embedding(user_id, embedding, embedding_service.model_name)
+            success = await self._update_profile_embedding_oid(oid, embedding, embedding_service.model_name)
             
             if not success:
                 raise Exception("Failed to update embedding in database")
@@ -455,12 +882,55 @@ class StudentService:
                 "message": "Embedding regenerated successfully",
                 "success": True,
                 "generated_at": datetime.utcnow(),
-                "embedding_dimension": len(embedding),
+                "embedding_dimension": embedding_service.embedding_dim,
                 "model_used": embedding_service.model_name
             }
         except Exception as e:
             raise Exception(f"Failed to regenerate embedding: {str(e)}")
 
+    
+    async def migrate_legacy_profile_embeddings(self, batch_size: int = 500) -> int:
+        """
+        Re-encode profile embeddings still stored as arrays of doubles into
+        packed float32 BSON vectors
+        
+        Returns:
+            Number of profiles migrated
+        """
+        from app.services.embedding_service import to_bson_vector
+        
+        try:
+            db = self.get_database()
+            
+            migrated = 0
+            ops = []
+            async for user in db.users.find(
+                {"profile_embedding": {"$type": "array"}},
+                {"profile_embedding": 1}
+            ).batch_size(batch_size):
+                ops.append(UpdateOne(
+                    {"_id": user["_id"]},
+                    {"$set": {"profile_embedding": to_bson_vector(user["profile_embedding"])}}
+                ))
+                invalidate_student_embedding(str(user["_id"]))
+                if len(ops) >= batch_size:
+                    await db.users.bulk_write(ops, ordered=False)
+                    migrated += len(ops)
+                    ops = []
+            
+            if ops:
+                await db.users.bulk_write(ops, ordered=False)
+                migrated += len(ops)
+            
+            if migrated:
+                logger.info(f"✅ Migrated {migrated} legacy profile embeddings to float32 vectors")
+            
+            return migrated
+        
+        except Exception as e:
+            logger.error(f"❌ Error migrating profile embeddings: {str(e)}")
+            return 0
+
 
 # Singleton instance
 student_service = StudentService()
\ No newline at end of file